@@ -3,16 +3,7 @@ import gym
 import matplotlib.colors as mplc
 import matplotlib.pyplot as plt
 
-from algorithms.sarsa import Sarsa
-from algorithms.double_sarsa import DoubleSarsa
-from algorithms.sarsa_n import SarsaN
-from algorithms.sarsa_lambda import SarsaLambda
-from algorithms.true_sarsa_lambda import TrueSarsaLambda
-from algorithms.qlearning import QLearning
-from algorithms.double_qlearning import DoubleQLearning
-from algorithms.expected_sarsa import ExpectedSarsa
-from algorithms.dynaq import DynaQ
-from algorithms.one_step_actor_critic import OneStepActorCritic
+from algorithms.algorithm_selector import make_agent
 
 from utils.operation_manager import run_episodes
 
@@ -34,30 +25,7 @@ def map_test(env, params,num_episodes = 500):
     params : values for required parameters
     num_episodes : number episodes used for training
     """
-    if params["algorithm"] == "sarsa":
-        RLAgent = Sarsa
-    elif params["algorithm"] == "double_sarsa":
-        RLAgent = DoubleSarsa
-    elif params["algorithm"] == "sarsa_n":
-        RLAgent = SarsaN
-    elif params["algorithm"] == "sarsa_lambda":
-        RLAgent = SarsaLambda
-    elif params["algorithm"] == "true_sarsa_lambda":
-        RLAgent = TrueSarsaLambda
-    elif params["algorithm"] == "qlearning":
-        RLAgent = QLearning
-    elif params["algorithm"] == "double_qlearning":
-        RLAgent = DoubleQLearning
-    elif params["algorithm"] == "expected_sarsa":
-        RLAgent = ExpectedSarsa
-    elif params["algorithm"] == "dynaq":
-        RLAgent = DynaQ
-    elif params["algorithm"] == "osac":
-        RLAgent = OneStepActorCritic
-    else:
-        unimplemented
-
-    agent = RLAgent(env, **params)
+    agent = make_agent(env, params)
     run_episodes(env, agent, num_episodes, new_agent=True, training=True)
 
     feature_ranges = [[l,h] for l,h
@@ -0,0 +1,71 @@
+from algorithms.sarsa import Sarsa
+from algorithms.double_sarsa import DoubleSarsa
+from algorithms.sarsa_n import SarsaN
+from algorithms.sarsa_lambda import SarsaLambda
+from algorithms.true_sarsa_lambda import TrueSarsaLambda
+from algorithms.qlearning import QLearning
+from algorithms.double_qlearning import DoubleQLearning
+from algorithms.expected_sarsa import ExpectedSarsa
+from algorithms.dynaq import DynaQ
+from algorithms.one_step_actor_critic import OneStepActorCritic
+from algorithms.lockstep_td import LockstepTD
+
+
+
+def select_algorithm(algorithm):
+    """
+    algorithm: name of the algorithm (as "algorithm" in config.py)
+        example: "sarsa_lambda"
+
+    return: class of agents of the algorithm
+    """
+    if algorithm == "sarsa":
+        RLAgent = Sarsa
+    elif algorithm == "double_sarsa":
+        RLAgent = DoubleSarsa
+    elif algorithm == "sarsa_n":
+        RLAgent = SarsaN
+    elif algorithm == "sarsa_lambda":
+        RLAgent = SarsaLambda
+    elif algorithm == "true_sarsa_lambda":
+        RLAgent = TrueSarsaLambda
+    elif algorithm == "qlearning":
+        RLAgent = QLearning
+    elif algorithm == "double_qlearning":
+        RLAgent = DoubleQLearning
+    elif algorithm == "expected_sarsa":
+        RLAgent = ExpectedSarsa
+    elif algorithm == "dynaq":
+        RLAgent = DynaQ
+    elif algorithm == "osac":
+        RLAgent = OneStepActorCritic
+    else:
+        unimplemented
+
+    return RLAgent
+
+
+# Algorithms learned in lockstep by LockstepTD (as its td_type).
+LOCKSTEP_ALGORITHMS = ("sarsa", "qlearning", "expected_sarsa")
+
+
+def make_agent(env, params):
+    """
+    params: parameters of the agent including its "algorithm" (a plain
+        dictionary - picklable, so agents can be made in other processes)
+
+    return: new agent
+    """
+    return select_algorithm(params["algorithm"])(env, **params)
+
+
+def make_lockstep_agent(envs, num_agents, params):
+    """
+    envs: copies of an environment stepped in lockstep
+    num_agents: number of agents (one per copy)
+    params: parameters of the agents (as make_agent) - "algorithm" is one
+        of LOCKSTEP_ALGORITHMS
+
+    return: new lockstep agent
+    """
+    return LockstepTD(envs, num_agents, params["algorithm"], **params)
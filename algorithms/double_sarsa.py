@@ -3,8 +3,11 @@ import random
 import gym.spaces as gsp
 
 from utils.tabular_q_function import QValueFunction as TabularQ
+from utils.lazy_tabular_q_function import QValueFunction as LazyTabularQ
 from utils.linapprox_q_function import QValueFunction as LinearQ
 from utils.exploration_policy import ExplorationPolicy
+from codings.coding_selector import representation_options
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 
 class DoubleSarsa():
@@ -26,16 +29,36 @@ class DoubleSarsa():
         self.prev_state = None
         self.prev_action = None
 
+        options = representation_options(kwargs)
+
+        # Both Q functions are stored in their own files.
+        storage_path = options["storage_path"]
+        options1, options2 = [
+            options if storage_path is None else
+            dict(options, storage_path=storage_path + suffix)
+            for suffix in (".1", ".2")]
+
         if qfun_type == "tabular":
             self.qfunction1 = TabularQ(env, len(self.actions),
-                                      granularity, coding_type=coding_type)
+                                      granularity, coding_type=coding_type,
+                                      options=options1)
             self.qfunction2 = TabularQ(env, len(self.actions),
-                                      granularity, coding_type=coding_type)
+                                      granularity, coding_type=coding_type,
+                                      options=options2)
+        elif qfun_type == "tabular_lazy":
+            self.qfunction1 = LazyTabularQ(env, len(self.actions),
+                                          granularity, coding_type=coding_type,
+                                          options=options1)
+            self.qfunction2 = LazyTabularQ(env, len(self.actions),
+                                          granularity, coding_type=coding_type,
+                                          options=options2)
         elif qfun_type == "linear_approx":
             self.qfunction1 = LinearQ(env, len(self.actions),
-                                     granularity, coding_type=coding_type)
+                                     granularity, coding_type=coding_type,
+                                     options=options1)
             self.qfunction2 = LinearQ(env, len(self.actions),
-                                     granularity, coding_type=coding_type)
+                                     granularity, coding_type=coding_type,
+                                     options=options2)
         else:
             unimplemented
 
@@ -55,15 +78,26 @@ class DoubleSarsa():
 
         self.policy.reset_episode()
 
+    def _components(self):
+
+        return {"qfunction1": self.qfunction1,
+                "qfunction2": self.qfunction2, "policy": self.policy}
+
+    def save(self, path):
+
+        save_checkpoint(path, self._components())
+
+    def load(self, path):
+
+        load_checkpoint(path, self._components())
+
     def act(self, reward, state, learning, done):
 
         if not done:
 
-            qvalues1 = [self.qfunction1.value(state, action)
-                       for action in self.actions]
-            qvalues2 = [self.qfunction2.value(state, action)
-                       for action in self.actions]
-            qvalues = [x+y for x,y in zip(qvalues1, qvalues2)]
+            qvalues1 = self.qfunction1.values(state)
+            qvalues2 = self.qfunction2.values(state)
+            qvalues = qvalues1 + qvalues2
 
             if learning:
                 action = self.policy.get_action(qvalues)
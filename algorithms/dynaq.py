@@ -1,16 +1,19 @@
 import random
 from collections import deque
+import numpy as np
 import gym.spaces as gsp
 
 from utils.tabular_q_function import QValueFunction as TabularQ
+from utils.lazy_tabular_q_function import QValueFunction as LazyTabularQ
 from utils.linapprox_q_function import QValueFunction as LinearQ
 from utils.exploration_policy import ExplorationPolicy
+from codings.coding_selector import representation_options
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 
 class DynaQ():
     def __init__(self, env, qfun_type, granularity, coding_type,
-                 alpha_w, gamma, plan_rep, model_size,
-                 **kwargs):
+                 alpha_w, gamma, plan_rep, model_size, **kwargs):
 
         assert isinstance(env.action_space, gsp.discrete.Discrete), \
             "Action space of environment is not discrete"
@@ -32,12 +35,20 @@ class DynaQ():
 
         self.model = None
 
+        options = representation_options(kwargs)
+
         if qfun_type == "tabular":
             self.qfunction = TabularQ(env, len(self.actions),
-                                      granularity, coding_type=coding_type)
+                                      granularity, coding_type=coding_type,
+                                      options=options)
+        elif qfun_type == "tabular_lazy":
+            self.qfunction = LazyTabularQ(env, len(self.actions),
+                                          granularity, coding_type=coding_type,
+                                          options=options)
         elif qfun_type == "linear_approx":
             self.qfunction = LinearQ(env, len(self.actions),
-                                     granularity, coding_type=coding_type)
+                                     granularity, coding_type=coding_type,
+                                     options=options)
         else:
             unimplemented
 
@@ -57,6 +68,39 @@ class DynaQ():
 
         self.policy.reset_episode()
 
+    def _components(self):
+
+        return {"qfunction": self.qfunction, "policy": self.policy}
+
+    def save(self, path):
+
+        # Transitions of the model are stored column by column (next
+        # states of final transitions are not used - states are stored
+        # instead of them).
+        model = [(state, action, reward,
+                  state if next_state is None else next_state, done)
+                 for state, action, reward, next_state, done in self.model]
+        columns = [np.array(column) for column in zip(*model)] \
+            if model else [np.zeros(0)] * 5
+        states, actions, rewards, next_states, dones = columns
+
+        save_checkpoint(path, self._components(),
+                        model_states=states, model_actions=actions,
+                        model_rewards=rewards, model_next_states=next_states,
+                        model_dones=dones)
+
+    def load(self, path):
+
+        arrays = load_checkpoint(path, self._components())
+
+        self.model = deque(maxlen=self.model_size)
+        for state, action, reward, next_state, done in zip(
+                arrays["model_states"], arrays["model_actions"].tolist(),
+                arrays["model_rewards"].tolist(),
+                arrays["model_next_states"], arrays["model_dones"].tolist()):
+            self.model.append((state, action, reward,
+                               None if done else next_state, done))
+
     def act(self, reward, state, learning, done):
 
         if self.prev_state is not None:
@@ -65,8 +109,7 @@ class DynaQ():
 
         if not done:
 
-            qvalues = [self.qfunction.value(state, action)
-                       for action in self.actions]
+            qvalues = self.qfunction.values(state)
             if learning:
                 action = self.policy.get_action(qvalues)
             else:
@@ -94,8 +137,7 @@ class DynaQ():
         if done:
             target = reward
         else:
-            qvalues = [self.qfunction.value(state, action)
-                       for action in self.actions]
+            qvalues = self.qfunction.values(state)
             best_action = self.policy.best_action(qvalues)
             max_q_value = qvalues[best_action]
             target = reward + self.gamma * max_q_value
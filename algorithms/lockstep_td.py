@@ -0,0 +1,146 @@
+import numpy as np
+import gym.spaces as gsp
+
+from utils.lockstep_q_function import QValueFunction as LockstepQ
+from utils.exploration_policy import ExplorationPolicy
+from codings.coding_selector import representation_options
+from utils.checkpoint import save_checkpoint, load_checkpoint
+
+
+class LockstepTD():
+    """
+    K independent agents learned by one step TD control (Sarsa, Q-learning
+    or Expected Sarsa) with linear approximation, acting in K copies of an
+    environment in lockstep (see LockstepEnv). States, rewards and
+    actions are arrays with one row per agent - encoding, selection of
+    actions and updates of all agents are batched.
+    """
+    def __init__(self, env, num_agents, td_type, qfun_type, granularity,
+                 coding_type, alpha_w, gamma, **kwargs):
+
+        assert isinstance(env.action_space, gsp.discrete.Discrete), \
+            "Action space of environment is not discrete"
+        assert isinstance(env.observation_space, gsp.box.Box), \
+            "Observation space of environment is not continuous"
+
+        self.num_agents = num_agents
+        self.td_type = td_type    # "sarsa", "qlearning", "expected_sarsa"
+
+        self.alpha = alpha_w
+        self.gamma = gamma
+
+        self.actions = list(range(env.action_space.n))
+
+        # Agents share the schedule of exploration (episodes of all agents
+        # start together).
+        self.policy = ExplorationPolicy(self.actions, **kwargs)
+
+        options = representation_options(kwargs)
+
+        if qfun_type == "linear_approx":
+            self.qfunction = LockstepQ(
+                env, num_agents, len(self.actions), granularity,
+                coding_type=coding_type, options=options)
+        else:
+            unimplemented
+
+        self._reset_previous()
+
+    def _reset_previous(self):
+
+        # Encoded previous states and previous actions of agents.
+        self.prev_codings = None
+        self.prev_actions = np.zeros(self.num_agents, dtype=int)
+        self.has_prev = np.zeros(self.num_agents, dtype=bool)
+
+    def reset(self):
+
+        self._reset_previous()
+
+        self.qfunction.reset()
+        self.policy.reset()
+
+    def reset_episode(self):
+
+        self._reset_previous()
+
+        self.qfunction.reset_episode()
+        self.policy.reset_episode()
+
+    def _components(self):
+
+        return {"qfunction": self.qfunction, "policy": self.policy}
+
+    def save(self, path):
+
+        save_checkpoint(path, self._components())
+
+    def load(self, path):
+
+        load_checkpoint(path, self._components())
+
+    def act(self, rewards, states, learning, dones, active):
+        """
+        rewards: rewards of agents (None at the start of episodes)
+        states: states of agents, shape (agents, state dimensions)
+        learning: True for training
+        dones: ends of episodes of agents, shape (agents,)
+        active: mask of agents acting in this step (agents whose episode
+            ended before are not active)
+
+        return: actions of agents (actions of agents not continuing are
+            not defined)
+        """
+        running = np.flatnonzero(active & ~dones)
+        actions = np.zeros(self.num_agents, dtype=int)
+        qvalues = None
+
+        if len(running) > 0:
+            codings = self.qfunction.encode(running, states[running])
+            qvalues = self.qfunction.values(running, codings)
+            if learning:
+                actions[running] = self.policy.get_action(qvalues)
+            else:
+                actions[running] = self.policy.best_action(qvalues)
+
+        if learning:
+            self._learn(rewards, dones, active, actions, running, qvalues)
+
+        if len(running) > 0:
+            if self.prev_codings is None:
+                self.prev_codings = np.zeros(
+                    (self.num_agents,) + codings.shape[1:], codings.dtype)
+            self.prev_codings[running] = codings
+            self.prev_actions[running] = actions[running]
+
+        self.has_prev[:] = False
+        self.has_prev[running] = True
+
+        return actions
+
+    def _learn(self, rewards, dones, active, actions, running, qvalues):
+
+        learned = np.flatnonzero(active & self.has_prev)
+        if len(learned) == 0:
+            return
+
+        # Values of next states of agents continuing their episodes (zero
+        # for ended episodes).
+        next_values = np.zeros(self.num_agents)
+        if len(running) > 0:
+            if self.td_type == "sarsa":
+                next_values[running] = \
+                    qvalues[np.arange(len(running)), actions[running]]
+            elif self.td_type == "qlearning":
+                next_values[running] = qvalues.max(axis=1)
+            elif self.td_type == "expected_sarsa":
+                probs = self.policy.get_distribution(qvalues)
+                next_values[running] = (probs * qvalues).sum(axis=1)
+            else:
+                unimplemented
+
+        targets = rewards[learned] + self.gamma * next_values[learned]
+
+        self.qfunction.update(learned, self.prev_codings[learned],
+                              self.prev_actions[learned], targets,
+                              self.alpha)
@@ -2,6 +2,8 @@ import gym.spaces as gsp
 
 from utils.linapprox_v_function import VValueFunction as VFun
 from utils.linapprox_policy import PiFunction as Policy
+from codings.coding_selector import representation_options
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 
 
@@ -24,10 +26,14 @@ class OneStepActorCritic():
         self.prev_state = None
         self.prev_action = None
 
+        options = representation_options(kwargs)
+
         self.policy = Policy(env, self.actions,
-                             granularity, coding_type=coding_type)
+                             granularity, coding_type=coding_type,
+                             options=options)
 
-        self.vfunction = VFun(env, granularity, coding_type=coding_type)
+        self.vfunction = VFun(env, granularity, coding_type=coding_type,
+                              options=options)
 
     def reset(self):
 
@@ -42,6 +48,18 @@ class OneStepActorCritic():
         self.prev_state = None
         self.prev_action = None
 
+    def _components(self):
+
+        return {"policy": self.policy, "vfunction": self.vfunction}
+
+    def save(self, path):
+
+        save_checkpoint(path, self._components())
+
+    def load(self, path):
+
+        load_checkpoint(path, self._components())
+
     def act(self, reward, state, learning, done):
 
         if not done:
@@ -1,8 +1,11 @@
 import gym.spaces as gsp
 
 from utils.tabular_q_function import QValueFunction as TabularQ
+from utils.lazy_tabular_q_function import QValueFunction as LazyTabularQ
 from utils.linapprox_q_function import QValueFunction as LinearQ
 from utils.exploration_policy import ExplorationPolicy
+from codings.coding_selector import representation_options
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 
 class Sarsa():
@@ -24,12 +27,20 @@ class Sarsa():
         self.prev_state = None
         self.prev_action = None
 
+        options = representation_options(kwargs)
+
         if qfun_type == "tabular":
             self.qfunction = TabularQ(env, len(self.actions),
-                                      granularity, coding_type=coding_type)
+                                      granularity, coding_type=coding_type,
+                                      options=options)
+        elif qfun_type == "tabular_lazy":
+            self.qfunction = LazyTabularQ(env, len(self.actions),
+                                          granularity, coding_type=coding_type,
+                                          options=options)
         elif qfun_type == "linear_approx":
             self.qfunction = LinearQ(env, len(self.actions),
-                                     granularity, coding_type=coding_type)
+                                     granularity, coding_type=coding_type,
+                                     options=options)
         else:
             unimplemented
 
@@ -48,12 +59,23 @@ class Sarsa():
 
         self.policy.reset_episode()
 
+    def _components(self):
+
+        return {"qfunction": self.qfunction, "policy": self.policy}
+
+    def save(self, path):
+
+        save_checkpoint(path, self._components())
+
+    def load(self, path):
+
+        load_checkpoint(path, self._components())
+
     def act(self, reward, state, learning, done):
 
         if not done:
 
-            qvalues = [self.qfunction.value(state, action)
-                       for action in self.actions]
+            qvalues = self.qfunction.values(state)
             if learning:
                 action = self.policy.get_action(qvalues)
             else:
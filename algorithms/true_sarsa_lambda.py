@@ -1,7 +1,10 @@
 import gym.spaces as gsp
 
 from utils.linapprox_q_function import QValueFunction as LinearQ
+from utils.true_online_q_function import QValueFunction as TrueOnlineQ
+from codings.coding_selector import BINARY_CODINGS, representation_options
 from utils.exploration_policy import ExplorationPolicy
+from utils.checkpoint import save_checkpoint, load_checkpoint
 
 
 
@@ -29,9 +32,22 @@ class TrueSarsaLambda():
         self.prev_state = None
         self.prev_action = None
 
-        self.qfunction = LinearQ(env, len(self.actions),
-                                 granularity, coding_type=coding_type,
-                                 lambda_val=lambda_val, et_type=et_type)
+        # Binary codings are learned by the dedicated engine working
+        # on positions of active features.
+        self.true_online = coding_type in BINARY_CODINGS
+
+        options = representation_options(kwargs)
+
+        if self.true_online:
+            self.qfunction = TrueOnlineQ(env, len(self.actions),
+                                         granularity, coding_type=coding_type,
+                                         lambda_val=lambda_val,
+                                         options=options)
+        else:
+            self.qfunction = LinearQ(env, len(self.actions),
+                                     granularity, coding_type=coding_type,
+                                     lambda_val=lambda_val, et_type=et_type,
+                                     options=options)
 
         self.q_old = None
 
@@ -52,12 +68,23 @@ class TrueSarsaLambda():
         self.qfunction.reset_episode()
         self.policy.reset_episode()
 
+    def _components(self):
+
+        return {"qfunction": self.qfunction, "policy": self.policy}
+
+    def save(self, path):
+
+        save_checkpoint(path, self._components())
+
+    def load(self, path):
+
+        load_checkpoint(path, self._components())
+
     def act(self, reward, state, learning, done):
 
         if not done:
 
-            qvalues = [self.qfunction.value(state, action)
-                       for action in self.actions]
+            qvalues = self.qfunction.values(state)
             if learning:
                 action = self.policy.get_action(qvalues)
             else:
@@ -78,6 +105,11 @@ class TrueSarsaLambda():
 
     def _learn(self, reward, state, action, done):
 
+        if self.true_online:
+            self.qfunction.learn(self.prev_state, self.prev_action, reward,
+                                 state, action, self.alpha, self.gamma)
+            return
+
         if done:
             target = reward
         else:
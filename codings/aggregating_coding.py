@@ -4,7 +4,8 @@ from operator import mul
 
 
 
-def get_discretizer(feature_ranges, number_bins, simple=False):
+def get_discretizer(feature_ranges, number_bins, simple=False,
+                    dtype=np.float64):
     """
     feature_ranges: range of each feature
         example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
@@ -12,47 +13,141 @@ def get_discretizer(feature_ranges, number_bins, simple=False):
         example: 8 bins for x and 6 bins for y -> [8, 6]
     simple: if True ten multi-dimensional coding, combination os
         one-dimensional codings otherwise
+    dtype: type of encodings (vectors of values)
+        example: single precision -> np.float32
 
-    return: aggregating coder
+    return: aggregating coder (encoding a sample or a batch of samples)
     """
 
     num_dims = len(feature_ranges)
     assert num_dims == len(number_bins), "Dimensionality mismatch"
 
-    # Find separators for separating bins along all dimensions.
-    bin_separators = [
-        np.linspace(feat_range[0], feat_range[1], feat_bins + 1)[1:-1]
+    # Bins along all dimensions are uniform - they are selected
+    # arithmetically (using lower bounds and inverse bin widths) instead
+    # of searching separators.
+    lower_bounds = np.array([feat_range[0] for feat_range in feature_ranges])
+    inv_widths = np.array([
+        feat_bins / (feat_range[1] - feat_range[0])
         for feat_range, feat_bins in zip(feature_ranges, number_bins)
-    ]
+    ])
+    max_bins = np.array(number_bins) - 1
 
-    def discretizer(features, vector_type=False):
+    # Separators of bins along all dimensions (the same as searched by the
+    # baseline coder), padded by infinities - edges k and k + 1 bound the
+    # k-th bin. Bins selected arithmetically are checked against them, so
+    # samples lying on separators fall into the same bins despite rounding
+    # of inverse widths.
+    num_edges = max(number_bins) + 1
+    edges = np.full((num_dims, num_edges), np.inf)
+    edges[:, 0] = -np.inf
+    for d, (feat_range, feat_bins) in enumerate(zip(feature_ranges,
+                                                    number_bins)):
+        edges[d, 1:feat_bins] = np.linspace(feat_range[0], feat_range[1],
+                                            feat_bins + 1)[1:-1]
+    edges = edges.reshape(-1)
+    edge_starts = np.arange(num_dims) * num_edges
+
+    # Strides for transforming multi-dimensional bin indices into
+    # positions of features.
+    strides = np.array([reduce(mul, number_bins[i+1:], 1)
+                        for i in range(num_dims)])
+
+    # Positions of the first bin of each dimension in the vector of
+    # features (for combination of one-dimensional codings).
+    feat_offsets = np.cumsum([0] + list(number_bins[:-1]))
+
+    if simple:
+        size = sum(number_bins)
+    else:
+        size = reduce(mul, number_bins, 1)
+
+    def select_bins(features):
+        """
+        features: sample (or batch of samples) to be encoded
+
+        return: indices of selected bins along all dimensions
+        """
+        x = np.asarray(features)
+        bins = np.floor((x - lower_bounds) * inv_widths)
+        bins = np.clip(bins, 0, max_bins).astype(int) + edge_starts
+
+        # Samples next to separators moved into the bins given by them.
+        bins += x >= edges[bins + 1]
+        bins -= x < edges[bins]
+
+        return bins - edge_starts
+
+    def discretizer(features, vector_type=False, sparse_type=False):
         """
         feature: sample with multiple dimensions to be encoded;
             example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
+        sparse_type: the form of an array of positions of active features
+            in the vector of values (takes precedence over vector_type)
 
         return: the encoding for the feature on each dimension
         """
+        if np.ndim(features) == 2:
+            return batch_discretizer(features, vector_type, sparse_type)
+
         assert num_dims == len(features), "Dimensionality mismatch"
 
         # Select suitable bins for feature sample (for each dimenstion
         # separately).
-        feat_codings = tuple(map(np.digitize, features, bin_separators))
-
-        # Transform indices of selected bins for separate dimensions into
-        # one vector if required.
-        if not simple and vector_type:
-            x = np.zeros(number_bins)
-            x[feat_codings] = 1
-            feat_codings = x.reshape(-1)
-        elif simple:
-            x = [np.zeros(bin) for bin in number_bins]
-            for ind, y in zip(feat_codings,x):
-                y[ind] = 1
-            feat_codings = np.concatenate(x)
+        feat_codings = select_bins(features)
+
+        if not simple and not vector_type and not sparse_type:
+            return [tuple(feat_codings.tolist())]
+
+        # Transform indices of selected bins into positions of active
+        # features.
+        if simple:
+            positions = feat_codings + feat_offsets
         else:
-            feat_codings = [feat_codings]
+            positions = feat_codings.dot(strides)[np.newaxis]
+
+        if sparse_type:
+            return positions
+
+        # Transform positions of active features into one vector.
+        x = np.zeros(size, dtype=dtype)
+        x[positions] = 1
+
+        return x
+
+    def batch_discretizer(features, vector_type=False, sparse_type=False):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+
+        return: the encodings for all samples - array of bin indices of
+            shape (samples, 1, dimensions), array of positions of active
+            features of shape (samples, active features) or array of
+            vectors of shape (samples, features)
+        """
+        features = np.asarray(features)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        # Select suitable bins for all samples (for each dimension
+        # separately).
+        feat_codings = select_bins(features)
+
+        if not simple and not vector_type and not sparse_type:
+            return feat_codings[:, np.newaxis, :]
+
+        # Transform indices of selected bins into positions of active
+        # features in vectors.
+        if simple:
+            positions = feat_codings + feat_offsets
+        else:
+            positions = feat_codings.dot(strides)[:, np.newaxis]
+
+        if sparse_type:
+            return positions
+
+        x = np.zeros((len(features), size), dtype=dtype)
+        np.put_along_axis(x, positions, 1, axis=1)
 
-        return feat_codings
+        return x
 
     return discretizer
 
@@ -4,12 +4,54 @@ from math import ceil, log
 
 from codings.aggregating_coding import get_discretizer as get_aggregating_discretizer
 from codings.tile_coding import get_discretizer as get_tile_discretizer
+from codings.hashed_tile_coding import get_discretizer as get_hashed_tile_discretizer
 from codings.rbf_coding import get_discretizer as get_rbf_discretizer
 from codings.fourier_coding import get_discretizer as get_fourier_discretizer
+from codings.fourier_coding import get_coefficients as get_fourier_coefficients
 
 
 
-def select_coding(env, representation, coding_type, granularity):
+# Coding types producing binary features - their encodings can be given
+# by positions of active features only.
+BINARY_CODINGS = ("aggregating", "aggregating_simple", "tile", "tile_simple",
+                  "tile_hashed")
+
+# Coding types producing mostly zero features - their encodings can be
+# given by positions and values of non-zero features only.
+SPARSE_CODINGS = BINARY_CODINGS + ("rbf_truncated",)
+
+# Options of representations (parameters of agents, see config.py) with
+# their defaults - options of codings and of storage of tables, weights
+# and traces (trace_cutoff None - the default of the representation).
+# Agents pass them to their representations in one dictionary.
+REPRESENTATION_OPTIONS = {"memory_size": None, "rbf_cutoff": None,
+                          "fourier_degree": None,
+                          "fourier_interactions": None, "dtype": "float64",
+                          "max_cells": None, "storage_path": None,
+                          "trace_cutoff": None}
+
+
+def representation_options(params):
+    """
+    params: parameters of an agent (or options of a representation)
+
+    return: options of representations given by params (defaults of the
+        other options)
+    """
+    return {name: params.get(name, default)
+            for name, default in REPRESENTATION_OPTIONS.items()}
+
+
+def select_coding(env, representation, coding_type, granularity,
+                  options=None):
+    """
+    options: options of the representation (see representation_options)
+        example: {"memory_size": 4096, "dtype": "float32"}
+
+    return: number of tilings, size of the coding and coder
+    """
+    options = representation_options(options or {})
+    dtype = options["dtype"]
 
     assert (len(granularity),) == env.observation_space.shape, \
         "Incompatible number of state dimensions"
@@ -18,18 +60,21 @@ def select_coding(env, representation, coding_type, granularity):
         assert coding_type == "aggregating" or coding_type == "tile", \
             "Only bin / tile codings can be used for tabular representation"
 
-    if type(env.unwrapped).__name__  == 'MountainCarEnv':
+    if type(env.unwrapped).__name__  in ('MountainCarEnv',
+                                         'MountainCarVectorEnv'):
         feature_ranges = [[l,h] for l,h
                           in zip(list(env.observation_space.low),
                                  list(env.observation_space.high))]
-    elif type(env.unwrapped).__name__  == 'CartPoleEnv':
+    elif type(env.unwrapped).__name__  in ('CartPoleEnv',
+                                           'CartPoleVectorEnv'):
         feature_ranges = [
             [-2.5, 2.5],     # cart position   -4.8, 4.8
             [-3.5, 3.5],     # cart velocity   -inf, inf
             [-0.28, 0.28],   # pole angle      -0.418, 0.418
             [-3.8, 3.8]      # pole velocity   -inf, inf
         ]
-    elif type(env.unwrapped).__name__  == 'AcrobotEnv':
+    elif type(env.unwrapped).__name__  in ('AcrobotEnv',
+                                           'AcrobotVectorEnv'):
         feature_ranges = [[l,h] for l,h
                           in zip(list(env.observation_space.low),
                                  list(env.observation_space.high))]
@@ -39,44 +84,79 @@ def select_coding(env, representation, coding_type, granularity):
     ntilings = None
 
     if coding_type == "aggregating":
-        discretizer = get_aggregating_discretizer(feature_ranges, granularity)
+        discretizer = get_aggregating_discretizer(feature_ranges, granularity,
+                                                  dtype=dtype)
         ntilings = 1
         coding_size = reduce(mul,granularity,1)
 
     elif coding_type == "aggregating_simple":
         discretizer = get_aggregating_discretizer(feature_ranges, granularity,
-                                                  True)
+                                                  True, dtype=dtype)
         ntilings = 1
         coding_size = sum(granularity)
 
     elif coding_type == "tile":
         ntilings = 2 ** ceil(2 + log(len(granularity), 2))
         discretizer = get_tile_discretizer(feature_ranges, ntilings,
-                                           granularity)
+                                           granularity, dtype=dtype)
         coding_size = reduce(mul,granularity,1) * ntilings
 
     elif coding_type == "tile_simple":
         ntilings = 4
         discretizer = get_tile_discretizer(feature_ranges, ntilings,
-                                           granularity, True)
+                                           granularity, True, dtype=dtype)
         coding_size = sum(granularity) * ntilings
 
+    elif coding_type == "tile_hashed":
+        memory_size = options["memory_size"]
+        assert memory_size is not None, \
+            "Memory size required for hashed tile coding"
+        ntilings = 2 ** ceil(2 + log(len(granularity), 2))
+        discretizer = get_hashed_tile_discretizer(feature_ranges, ntilings,
+                                                  granularity, memory_size,
+                                                  dtype=dtype)
+        coding_size = memory_size
+
     elif coding_type == "rbf":
-        discretizer = get_rbf_discretizer(feature_ranges, granularity)
+        discretizer = get_rbf_discretizer(feature_ranges, granularity,
+                                          dtype=dtype)
+        coding_size = reduce(mul,granularity,1)
+
+    elif coding_type == "rbf_truncated":
+        rbf_cutoff = options["rbf_cutoff"]
+        assert rbf_cutoff is not None, \
+            "Cutoff required for truncated rbf coding"
+        discretizer = get_rbf_discretizer(feature_ranges, granularity,
+                                          cutoff=rbf_cutoff, dtype=dtype)
         coding_size = reduce(mul,granularity,1)
 
     elif coding_type == "rbf_simple":
-        discretizer = get_rbf_discretizer(feature_ranges, granularity, True)
+        discretizer = get_rbf_discretizer(feature_ranges, granularity, True,
+                                          dtype=dtype)
         coding_size = sum(granularity)
 
     elif coding_type == "fourier":
-        discretizer = get_fourier_discretizer(feature_ranges, granularity)
+        discretizer = get_fourier_discretizer(feature_ranges, granularity,
+                                              dtype=dtype)
         coding_size = reduce(mul,granularity,1)
 
     elif coding_type == "fourier_simple":
-        discretizer = get_fourier_discretizer(feature_ranges, granularity, True)
+        discretizer = get_fourier_discretizer(feature_ranges, granularity,
+                                              True, dtype=dtype)
         coding_size = sum(granularity) - (len(granularity) - 1)
 
+    elif coding_type == "fourier_bounded":
+        fourier_degree = options["fourier_degree"]
+        fourier_interactions = options["fourier_interactions"]
+        assert (fourier_degree is not None
+                or fourier_interactions is not None), \
+            "Bound required for bounded fourier coding"
+        discretizer = get_fourier_discretizer(
+            feature_ranges, granularity, max_degree=fourier_degree,
+            max_interactions=fourier_interactions, dtype=dtype)
+        coding_size = get_fourier_coefficients(
+            granularity, fourier_degree, fourier_interactions).shape[1]
+
     else:
         unimplemented
 
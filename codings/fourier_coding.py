@@ -1,9 +1,39 @@
 import numpy as np
-from itertools import product
 
 
 
-def get_discretizer(feature_ranges, orders, simple=False):
+def get_coefficients(orders, max_degree=None, max_interactions=None):
+    """
+    orders: number of different frequencies for each dimension
+        example: order 8 for x and order 6 for y -> [8, 6]
+    max_degree: if given then only coefficient vectors with total degree
+        (sum of coefficients) up to max_degree are kept
+        example: [1, 2] and [0, 3] kept, [2, 2] dropped for degree 3 -> 3
+    max_interactions: if given then only coefficient vectors with up to
+        max_interactions non-zero coefficients are kept
+        example: [0, 3] kept, [1, 2] dropped for one interaction -> 1
+
+    return: dimension frequency multiplies (one coefficient vector per
+        column, in order of the cartesian product of frequencies)
+    """
+
+    # Coefficient vectors are extended dimension by dimension - the
+    # vectors exceeding bounds are dropped immediately (without creating
+    # whole cartesian product).
+    combs = [()]
+    for order in orders:
+        combs = [
+            comb + (coef,) for comb in combs for coef in range(order)
+            if (max_degree is None or sum(comb) + coef <= max_degree)
+            and (max_interactions is None or
+                 np.count_nonzero(comb) + (coef > 0) <= max_interactions)
+        ]
+
+    return np.transpose(np.array(combs))
+
+
+def get_discretizer(feature_ranges, orders, simple=False,
+                    max_degree=None, max_interactions=None, dtype=np.float64):
     """
     feature_ranges: range of each feature
         example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
@@ -11,8 +41,14 @@ def get_discretizer(feature_ranges, orders, simple=False):
         example: order 8 for x and order 6 for y -> [8, 6]
     simple: if True then multi-dimensional coding, combination of
         one-dimensional codings otherwise
+    max_degree: bound for total degree of coefficient vectors
+        example: up to degree 3 -> 3
+    max_interactions: bound for number of non-zero coefficients
+        example: up to pairwise combinations of dimensions -> 2
+    dtype: type of computations and encodings
+        example: single precision -> np.float32
 
-    return: fourier cos base coder
+    return: fourier cos base coder (encoding a sample or a batch of samples)
     """
 
     num_dims = len(feature_ranges)
@@ -24,24 +60,29 @@ def get_discretizer(feature_ranges, orders, simple=False):
                    for feat_range in feature_ranges])
 
     # Find dimension frequency multiplies
-    tmp = [range(order) for order in orders]
-    coefs = np.transpose(np.array([comb for comb in product(*tmp)]))
-
     if simple:
-        selections = np.sum(coefs.clip(0,1),axis=0) <= 1
-        coefs = coefs[:,selections]
+        max_interactions = 1
+    coefs = get_coefficients(orders, max_degree, max_interactions)
+
+    # Normalisation and multiplication by pi precomputed into coefficients:
+    #     (x - n1) / n2 * coefs * pi = x * scaled_coefs - shifts
+    scaled_coefs = (coefs * np.pi / n2[:, np.newaxis]).astype(dtype)
+    shifts = np.matmul(n1, coefs * np.pi / n2[:, np.newaxis]).astype(dtype)
 
     def discretizer(features, **kwargs):
         """
         feature: multi-dimensional sample to be encoded;
             example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
+            (or batch of samples, one sample per row;
+            example: [[0.8, 3.2], [0.1, 2.5]])
 
-        return: the encoding using fourier cos base coding
+        return: the encoding using fourier cos base coding (array of
+            encodings of shape (samples, features) for batch of samples)
         """
-        assert num_dims == len(features), "Dimensionality mismatch"
+        assert num_dims == np.shape(features)[-1], "Dimensionality mismatch"
 
-        norm_features = (features - n1) / n2
-        codings = np.cos(np.matmul(norm_features, coefs) * np.pi)
+        features = np.asarray(features, dtype=dtype)
+        codings = np.cos(np.matmul(features, scaled_coefs) - shifts)
 
         return codings
 
@@ -53,3 +94,5 @@ if __name__ == '__main__':
     bn = [5,5]
     disc = get_discretizer(fr,bn,True)
     print(disc([10,10]))
+    disc = get_discretizer(fr,bn,max_degree=2,dtype=np.float32)
+    print(disc([10,10]))
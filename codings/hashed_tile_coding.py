@@ -0,0 +1,170 @@
+import numpy as np
+
+from codings.tile_coding import get_discretizer as get_tile_discretizer
+
+
+
+class IndexHashTable():
+    """
+    Mapping of tiles onto a fixed number of indices (based on the index
+    hash table of Sutton's tiles3). Tiles get indices in order of their
+    first visit, after all indices are used tiles are hashed onto already
+    used indices (collisions are counted). Tiles of one sample get
+    distinct indices - a tile colliding with another tile of the sample
+    takes the next index not used by the sample.
+    """
+    def __init__(self, size):
+
+        self.size = size
+        self.overfull_count = 0
+        self.dictionary = {}
+
+    def reset(self):
+        self.overfull_count = 0
+        self.dictionary = {}
+
+    def count(self):
+        return len(self.dictionary)
+
+    def full(self):
+        return len(self.dictionary) >= self.size
+
+    def get_state(self):
+        return {"tiles": np.array(list(self.dictionary.keys()), dtype=int),
+                "indices": np.array(list(self.dictionary.values()),
+                                    dtype=int),
+                "overfull_count": self.overfull_count}
+
+    def set_state(self, state):
+        tiles = [tuple(tile) for tile in state["tiles"].tolist()]
+        self.dictionary = dict(zip(tiles, state["indices"].tolist()))
+        self.overfull_count = int(state["overfull_count"])
+
+    def get_index(self, tile):
+        """
+        tile: hashable coordinates of a tile
+            example: tiling 3, bins 1 and 2 -> (3, 1, 2)
+
+        return: index of the tile
+        """
+        if tile in self.dictionary:
+            return self.dictionary[tile]
+
+        count = len(self.dictionary)
+        if count >= self.size:
+            self.overfull_count += 1
+            return hash(tile) % self.size
+        else:
+            self.dictionary[tile] = count
+            return count
+
+    def get_indices(self, tiles):
+        """
+        tiles: hashable coordinates of tiles of one sample
+            example: tilings 0 and 1 -> [(0, 1, 2), (1, 1, 1)]
+
+        return: distinct indices of the tiles
+        """
+        indices = [self.get_index(tile) for tile in tiles]
+
+        # Collisions are possible only after all indices are used.
+        if self.overfull_count > 0 and len(set(indices)) < len(indices):
+            used = set()
+            for i, index in enumerate(indices):
+                while index in used:
+                    index = (index + 1) % self.size
+                used.add(index)
+                indices[i] = index
+
+        return indices
+
+
+def get_discretizer(feature_ranges, number_tilings, number_bins, memory_size,
+                    dtype=np.float64):
+    """
+    feature_ranges: range of each feature
+        example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
+    number_tilings: number of tilings
+        example: 8 tilings -> 8
+    number_bins: bin size for each dimension
+        example: 8 bins for x and 6 bins for y -> [8, 6]
+    memory_size: number of indices (features) the tiles are hashed onto
+        example: 4096 features -> 4096
+    dtype: type of encodings (vectors of values)
+        example: single precision -> np.float32
+
+    return: hashed tile coder (encoding a sample or a batch of samples)
+    """
+    num_dims = len(feature_ranges)
+
+    # Tiles of a sample get distinct indices (see IndexHashTable).
+    assert memory_size >= number_tilings, "Less features than tilings"
+
+    # Tiles are selected by ordinary tile coder, only their indices
+    # are hashed.
+    tile_discretizer = get_tile_discretizer(feature_ranges, number_tilings,
+                                            number_bins)
+
+    iht = IndexHashTable(memory_size)
+
+    def discretizer(features, vector_type=False, sparse_type=False):
+        """
+        features: multi-dimensional sample to be encoded;
+            example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
+        vector_type: the form of a vector of values (if not sparse_type)
+        sparse_type: the form of an array of positions of active features
+            in the vector of values (default form)
+
+        return: the multi-dimensional encoding for the feature using
+            hashed tile coding
+        """
+        if np.ndim(features) == 2:
+            return batch_discretizer(features, vector_type, sparse_type)
+
+        assert num_dims == len(features), "Dimensionality mismatch"
+
+        tiles = tile_discretizer(features)
+        positions = np.array(iht.get_indices([(i,) + tile for i, tile
+                                              in enumerate(tiles)]))
+
+        if vector_type and not sparse_type:
+            x = np.zeros(memory_size, dtype=dtype)
+            x[positions] = 1
+            return x
+
+        return positions
+
+
+    def batch_discretizer(features, vector_type=False, sparse_type=False):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+
+        return: array of positions of active features of shape
+            (samples, tilings) - the same positions as of samples encoded
+            one by one - or array of vectors of shape (samples, features)
+        """
+        tiles = tile_discretizer(features)
+
+        positions = np.array([iht.get_indices([(i,) + tuple(tile)
+                                               for i, tile
+                                               in enumerate(sample_tiles)])
+                              for sample_tiles in tiles.tolist()],
+                             dtype=int).reshape(len(tiles), number_tilings)
+
+        if vector_type and not sparse_type:
+            x = np.zeros((len(positions), memory_size), dtype=dtype)
+            np.put_along_axis(x, positions, 1, axis=1)
+            return x
+
+        return positions
+
+    discretizer.iht = iht
+
+    return discretizer
+
+
+if __name__ == '__main__':
+    fr = [[0.,10],[0,10]]
+    disc = get_discretizer(fr,8,[5,5],64)
+    print(disc([1,1]), disc([1,1.5]), disc.iht.count())
@@ -1,9 +1,12 @@
 import numpy as np
 from itertools import product
+from functools import reduce
+from operator import mul
 
 
 
-def get_discretizer(feature_ranges, number_centers, simple=False):
+def get_discretizer(feature_ranges, number_centers, simple=False,
+                    cutoff=None, dtype=np.float64):
     """
     feature_ranges: range of each feature
         example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
@@ -11,8 +14,14 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
         example: 8 bins for x and 6 bins for y -> [8, 6]
     simple: if True then multi-dimensional coding, combination of
         one-dimensional codings otherwise
-
-    return: rbf coder
+    cutoff: if given then only centers within the distance of cutoff
+        bin widths from the sample are evaluated (truncated coding),
+        the other features are zeros
+        example: centers within 2 bin widths -> 2
+    dtype: type of computations and encodings
+        example: single precision -> np.float32
+
+    return: rbf coder (encoding a sample or a batch of samples)
     """
 
     num_dims = len(feature_ranges)
@@ -20,7 +29,8 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
 
     # Find centers of all bins along all dimensions.
     bin_centers = [
-        np.linspace(feat_range[0], feat_range[1], 2*feat_centers + 1)[1:-1:2]
+        np.linspace(feat_range[0], feat_range[1],
+                    2*feat_centers + 1)[1:-1:2].astype(dtype)
         for feat_range, feat_centers in zip(feature_ranges, number_centers)
     ]
 
@@ -33,6 +43,19 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
     # Prepare denominators for rbf 
     denominators = [2 * sigma**2 for sigma in bin_widths]
 
+    # Matrix of all centers (one center per column).
+    centers = np.array([center for center in product(*bin_centers)])
+    centers = centers.transpose().astype(dtype)
+    coding_size = centers.shape[1]
+
+    # Strides for transforming indices of centers along dimensions into
+    # positions of features.
+    strides = [reduce(mul, number_centers[i+1:], 1) for i in range(num_dims)]
+
+    # Centers farther than cutoff widths have rbf exponents above limit.
+    if cutoff is not None:
+        limit = cutoff**2 / 2
+
     def discretizer(features, **kwargs):
         """
         feature: multi-dimensional somple to be encoded;
@@ -40,7 +63,11 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
 
         return: the multi-dimensional encoding using rbf coding
         """
+        if np.ndim(features) == 2:
+            return batch_discretizer(features)
+
         assert num_dims == len(features), "Dimensionality mismatch"
+        features = np.asarray(features, dtype=dtype)
 
         # Readable but slow alternative - replaced by a faster one
         # def gauss(features, center):
@@ -53,14 +80,56 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
         # x =  [gauss(features, center) for center in product(*bin_centers)]
         # x = np.array(x)
 
-        y = np.array([center for center in product(*bin_centers)]).transpose()
-        y = [ (features[i] - y[i])**2 / denominators[i]
-              for i in range(y.shape[0])]
+        y = [ (features[i] - centers[i])**2 / denominators[i]
+              for i in range(num_dims)]
         y = np.exp(- sum(y))
 
         return y
 
 
+    def discretizer_truncated(features, sparse_type=False, **kwargs):
+        """
+        feature: multi-dimensional sample to be encoded;
+            example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
+        sparse_type: the form of a pair of positions and values of
+            non-zero features
+
+        return: the multi-dimensional encoding using truncated rbf coding
+        """
+        if np.ndim(features) == 2:
+            return batch_discretizer_truncated(features, sparse_type)
+
+        assert num_dims == len(features), "Dimensionality mismatch"
+        features = np.asarray(features, dtype=dtype)
+
+        # Centers near the sample are collected dimension by dimension
+        # (grid lookup) - partial combinations of centers already being
+        # too far are dropped immediately.
+        positions = np.zeros(1, dtype=int)
+        exponents = np.zeros(1, dtype=dtype)
+        for i in range(num_dims):
+            terms = (features[i] - bin_centers[i])**2 / denominators[i]
+            near = np.flatnonzero(terms <= limit)
+
+            exponents = (exponents[:, np.newaxis] + terms[near]).reshape(-1)
+            positions = (positions[:, np.newaxis]
+                         + near * strides[i]).reshape(-1)
+
+            selected = exponents <= limit
+            exponents = exponents[selected]
+            positions = positions[selected]
+
+        values = np.exp(- exponents)
+
+        if sparse_type:
+            return positions, values
+
+        x = np.zeros(coding_size, dtype=dtype)
+        x[positions] = values
+
+        return x
+
+
     def discretizer_simple(features, **kwargs):
         """
         feature: multi-dimensional sample to be encoded;
@@ -68,7 +137,11 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
 
         return: the combination of one-dimensional encodings using rbf coding
         """
+        if np.ndim(features) == 2:
+            return batch_discretizer_simple(features)
+
         assert num_dims == len(features), "Dimensionality mismatch"
+        features = np.asarray(features, dtype=dtype)
 
         x = [ np.exp(-(f - c)**2 / d)
               for f, c, d in zip(features, bin_centers, denominators) ]
@@ -76,8 +149,69 @@ def get_discretizer(feature_ranges, number_centers, simple=False):
 
         return x
 
+
+    def batch_discretizer(features):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+
+        return: array of multi-dimensional encodings of shape
+            (samples, features)
+        """
+        features = np.asarray(features, dtype=dtype)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        y = [ (features[:, i, np.newaxis] - centers[i])**2 / denominators[i]
+              for i in range(num_dims)]
+        y = np.exp(- sum(y))
+
+        return y
+
+
+    def batch_discretizer_truncated(features, sparse_type=False):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+        sparse_type: the form of a list of pairs of positions and values
+            of non-zero features
+
+        return: array of multi-dimensional encodings of shape
+            (samples, features) or list of pairs of positions and values
+        """
+        features = np.asarray(features, dtype=dtype)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        if sparse_type:
+            return [discretizer_truncated(x, sparse_type) for x in features]
+
+        y = sum((features[:, i, np.newaxis] - centers[i])**2 / denominators[i]
+                for i in range(num_dims))
+        y = np.where(y <= limit, np.exp(- y), 0.0)
+
+        return y
+
+
+    def batch_discretizer_simple(features):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+
+        return: array of combinations of one-dimensional encodings of
+            shape (samples, features)
+        """
+        features = np.asarray(features, dtype=dtype)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        x = [ np.exp(-(features[:, i, np.newaxis] - c)**2 / d)
+              for i, (c, d) in enumerate(zip(bin_centers, denominators)) ]
+        x = np.concatenate(x, axis=1)
+
+        return x
+
     if simple:
         return discretizer_simple
+    elif cutoff is not None:
+        return discretizer_truncated
     else:
         return discretizer
 
@@ -89,3 +223,5 @@ if __name__ == '__main__':
     print(disc([1,1]))
     disc = get_discretizer(fr,bn)
     print(disc([1,1]))
+    disc = get_discretizer(fr,bn,cutoff=2)
+    print(disc([1,1],sparse_type=True))
@@ -74,7 +74,43 @@ def create_tilings(num_dims, feature_ranges, number_tilings, number_bins):
     return tilings
 
 
-def get_discretizer(feature_ranges, number_tilings, number_bins, simple=False):
+def create_grids(num_dims, feature_ranges, number_tilings, number_bins):
+    """
+    num_dims: dimensionality of state space
+        example: two dimensional state space -> 2
+    feature_ranges: range of each feature
+        example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
+    number_tilings: number of tilings
+        example: 8 tilings -> 8
+    number_bins: bin size for each dimension
+        example: 8 bins for x and 6 bins for y -> [8, 6]
+
+    return: offsets of all tilings along all dimensions (array of shape
+            (tilings, dimensions)) and bin widths along all dimensions -
+            uniform grids given by the same separators as create_tilings
+            (the k-th separator is offset + k * width)
+    """
+
+    # The same slices and shifts as for create_tilings.
+    feat_slice_lengths = np.array([
+        (feat_range[1] - feat_range[0]) /
+        ((feat_bins - 1) * number_tilings + 1)
+        for feat_range, feat_bins in zip(feature_ranges, number_bins)
+    ])
+
+    shift_pattern = np.array([2 * i + 1 for i in range(num_dims)])
+    shifts = (np.arange(number_tilings)[:, np.newaxis] * shift_pattern
+              % number_tilings)
+
+    offsets = (np.array([fr[0] for fr in feature_ranges])
+               + (shifts - (number_tilings - 1)) * feat_slice_lengths)
+    widths = number_tilings * feat_slice_lengths
+
+    return offsets, widths
+
+
+def get_discretizer(feature_ranges, number_tilings, number_bins, simple=False,
+                    dtype=np.float64):
     """
     feature_ranges: range of each feature
         example: x: [-1, 1], y: [2, 5] -> [[-1, 1], [2, 5]]
@@ -84,8 +120,10 @@ def get_discretizer(feature_ranges, number_tilings, number_bins, simple=False):
         example: 8 bins for x and 6 bins for y -> [8, 6]
     simple: if True then multi-dimensiona coding, combination of
         one-dimensional codings otherwise
+    dtype: type of encodings (vectors of values)
+        example: single precision -> np.float32
 
-    return: tile coder
+    return: tile coder (encoding a sample or a batch of samples)
     """
     num_dims = len(feature_ranges)
 
@@ -100,71 +138,208 @@ def get_discretizer(feature_ranges, number_tilings, number_bins, simple=False):
 
     assert num_dims == len(number_bins), "Dimensionality mismatch"
 
-    # Find separators for separating bins for all tilings along all
-    # dimensions.
+    # Find offsets and bin widths of uniform grids for all tilings along
+    # all dimensions - bins are selected arithmetically instead of
+    # searching separators.
+    if not simple:
+        offsets, widths = create_grids(num_dims, feature_ranges,
+                                       number_tilings, number_bins)
+    else:
+        grids = [create_grids(1, [feature_ranges[i]],
+                              number_tilings, [number_bins[i]])
+                 for i in range(num_dims)]
+        offsets = np.concatenate([grid[0] for grid in grids], axis=1)
+        widths = np.concatenate([grid[1] for grid in grids])
+
+    inv_widths = 1 / widths
+    max_bins = np.array(number_bins) - 1
+
+    # Separators of bins of all tilings along all dimensions (the same as
+    # searched by the baseline coder), padded by infinities - edges k and
+    # k + 1 bound the k-th bin. Bins selected arithmetically are checked
+    # against them, so samples lying on separators fall into the same
+    # bins despite rounding of offsets and widths.
     if not simple:
         tilings = create_tilings(num_dims, feature_ranges,
                                  number_tilings, number_bins)
     else:
-        tilings = np.array([create_tilings(1, [feature_ranges[i]],
-                                           number_tilings, number_bins)
-                            for i in range(num_dims)])
-        tilings = np.array(tilings).reshape(num_dims, number_tilings, -1)
+        tilings = zip(*[create_tilings(1, [feature_ranges[i]],
+                                       number_tilings, [number_bins[i]])
+                        for i in range(num_dims)])
+    num_edges = max(number_bins) + 1
+    edges = np.full((number_tilings, num_dims, num_edges), np.inf)
+    edges[..., 0] = -np.inf
+    for t, tiling in enumerate(tilings):
+        for d, separators in enumerate(tiling):
+            separators = np.ravel(separators)
+            edges[t, d, 1:len(separators) + 1] = separators
+    edges = edges.reshape(-1)
+    edge_starts = (np.arange(number_tilings * num_dims) * num_edges
+                   ).reshape(number_tilings, num_dims)
+
+    # Positions of the first bin of each tiling in the vector of features
+    # and strides for transforming multi-dimensional bin indices into
+    # positions.
+    tiling_size = reduce(mul, number_bins, 1)
+    tiling_starts = np.arange(number_tilings) * tiling_size
+    strides = np.array([reduce(mul, number_bins[i+1:], 1)
+                        for i in range(num_dims)])
+
+    # Positions of the first bin of each tiling of each dimension in the
+    # vector of features (for combination of one-dimensional codings).
+    feat_offsets = np.cumsum([0] + list(number_bins[:-1])) * number_tilings
+    simple_starts = (feat_offsets
+                     + np.arange(number_tilings)[:, np.newaxis]
+                     * np.array(number_bins))
+
+
+    def select_bins(features):
+        """
+        features: sample (or batch of samples) to be encoded
+
+        return: indices of selected bins for all tilings along all
+            dimensions (array of shape (tilings, dimensions), or
+            (samples, tilings, dimensions) for batch of samples)
+        """
+        x = np.asarray(features)[..., np.newaxis, :]
+        bins = np.floor((x - offsets) * inv_widths)
+        bins = np.clip(bins, 0, max_bins).astype(int) + edge_starts
 
+        # Samples next to separators moved into the bins given by them.
+        bins += x >= edges[bins + 1]
+        bins -= x < edges[bins]
 
-    def discretizer(features, vector_type=False):
+        return bins - edge_starts
+
+
+    def discretizer(features, vector_type=False, sparse_type=False):
         """
         features: multi-dimensional sample to be encoded;
             example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
         vector_type: the form of a list of indices or a vector of values
+        sparse_type: the form of an array of positions of active features
+            in the vector of values (takes precedence over vector_type)
 
         return: the multi-dimensional encoding for the feature using
             tile coding
         """
+        if np.ndim(features) == 2:
+            return batch_discretizer(features, vector_type, sparse_type)
+
         assert num_dims == len(features), "Dimensionality mismatch"
 
-        # Select suitable bins for feature sample (for each dimension
-        # separately).
-        feat_codings = list(map(lambda x: tuple(map(np.digitize, features, x)),
-                                tilings))
+        # Select suitable bins for feature sample (for each tiling and
+        # each dimension).
+        feat_codings = select_bins(features)
+
+        if not vector_type and not sparse_type:
+            return list(map(tuple, feat_codings.tolist()))
+
+        # Transform indices of selected bins into positions of active
+        # features (one active feature per tiling).
+        positions = feat_codings.dot(strides) + tiling_starts
+
+        if sparse_type:
+            return positions
 
-        # Transform indices of selected bins for separate dimensions into
-        # one vector if required.
-        if vector_type:
-            x = [np.zeros(number_bins) for _ in range(number_tilings)]
-            for i in range(number_tilings):
-                x[i][feat_codings[i]] = 1
-            feat_codings = np.concatenate([y.reshape(-1) for y in x])
+        x = np.zeros(tiling_size * number_tilings, dtype=dtype)
+        x[positions] = 1
 
-        return feat_codings
+        return x
 
 
-    def discretizer_simple(features, **kwargs):
+    def discretizer_simple(features, sparse_type=False, **kwargs):
         """
         features: multi-dimensional sample to be encoded;
             example: x = 0.8 and y = 3.2 -> [0.8, 3.2]
+        sparse_type: the form of an array of positions of active features
+            in the vector of values
 
         return: the combination of one-dimensional encodings for the feature
             using tile coding
         """
+        if np.ndim(features) == 2:
+            return batch_discretizer_simple(features, sparse_type)
+
         assert num_dims == len(features), "Dimensionality mismatch"
 
         # Select suitable bins for feature sample (for each dimension
-        # separately).
-        feat_codings = [list(map(lambda x: np.digitize(features[i], x),
-                                 tilings[i]))
-                        for i in range(num_dims)]
+        # and each tiling) and transform them into positions of active
+        # features (one active feature per dimension and tiling).
+        positions = (select_bins(features) + simple_starts).T.reshape(-1)
+
+        if sparse_type:
+            return positions
+
+        x = np.zeros(sum(number_bins) * number_tilings, dtype=dtype)
+        x[positions] = 1
+
+        return x
+
+
+    def batch_discretizer(features, vector_type=False, sparse_type=False):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+        vector_type: the form of an array of indices or an array of vectors
+        sparse_type: the form of an array of positions of active features
+
+        return: the encodings for all samples - array of bin indices of
+            shape (samples, tilings, dimensions), array of positions of
+            active features of shape (samples, tilings) or array of vectors
+            of shape (samples, features)
+        """
+        features = np.asarray(features)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        # Select suitable bins for all samples (for each tiling and each
+        # dimension).
+        feat_codings = select_bins(features)
+
+        if not vector_type and not sparse_type:
+            return feat_codings
 
-        # Transform indices of selected bins for separate dimensions into
-        # one vector if required.
-        x = np.concatenate([[np.zeros(n) for _ in range(number_tilings)]
-             for n in number_bins])
+        # Transform indices of selected bins into positions of active
+        # features in vectors (one active feature per tiling).
+        positions = feat_codings.dot(strides) + tiling_starts
 
-        for i,code in zip(np.concatenate(feat_codings),x):
-            code[i] = 1
-        feat_codings = np.concatenate(x)
+        if sparse_type:
+            return positions
 
-        return feat_codings
+        x = np.zeros((len(features), tiling_size * number_tilings),
+                     dtype=dtype)
+        np.put_along_axis(x, positions, 1, axis=1)
+
+        return x
+
+
+    def batch_discretizer_simple(features, sparse_type=False):
+        """
+        features: batch of samples to be encoded (one sample per row);
+            example: [0.8, 3.2] and [0.1, 2.5] -> [[0.8, 3.2], [0.1, 2.5]]
+        sparse_type: the form of an array of positions of active features
+
+        return: array of combinations of one-dimensional encodings of
+            shape (samples, features) or array of positions of active
+            features of shape (samples, active features)
+        """
+        features = np.asarray(features)
+        assert num_dims == features.shape[1], "Dimensionality mismatch"
+
+        # Select suitable bins for all samples (for each dimension and
+        # each tiling) and transform them into positions of active
+        # features in vectors.
+        positions = select_bins(features) + simple_starts
+        positions = positions.transpose(0, 2, 1).reshape(len(features), -1)
+
+        if sparse_type:
+            return positions
+
+        x = np.zeros((len(features), sum(number_bins) * number_tilings),
+                     dtype=dtype)
+        np.put_along_axis(x, positions, 1, axis=1)
+
+        return x
 
     if simple:
         return discretizer_simple
@@ -216,6 +391,19 @@ if __name__ == '__main__':
                              [[0.6],[0.6]],[[0.8],[0.4]]])
             )
 
+    class TestCreateGrids(unittest.TestCase):
+        def test_same_separators(self):
+            ranges = [[0,1],[-1,2],[2,3]]
+            bins = [3,4,5]
+            tilings = create_tilings(3,ranges,16,bins)
+            offsets, widths = create_grids(3,ranges,16,bins)
+            for tiling, offset in zip(tilings, offsets):
+                for seps, off, width in zip(tiling, offset, widths):
+                    self.assertTrue(
+                        np.allclose(seps,
+                                    off + width * np.arange(1,len(seps)+1))
+                    )
+
     class TestGetDiscretizer(unittest.TestCase):
         def test_discretize_1_dim(self):
             disc = get_discretizer([[0,1]],4,[2])
@@ -243,5 +431,17 @@ if __name__ == '__main__':
             self.assertEqual(list(disc([0.1,0.3])),[0, 0, 0, 0, 1, 0, 0, 0])
             self.assertEqual(list(disc([0.5,0.7])),[1, 1, 0, 0, 1, 1, 1, 0])
 
+        def test_discretize_batch(self):
+            ranges = [[0,1],[0,1]]
+            samples = [[0.9,0.1],[0.3,0.7],[0.5,0.5]]
+            for simple in [False, True]:
+                disc = get_discretizer(ranges,8,[2,2],simple)
+                for vector_type in [False, True]:
+                    self.assertTrue(
+                        np.array_equal(disc(samples,vector_type=vector_type),
+                                       [disc(x,vector_type=vector_type)
+                                        for x in samples])
+                    )
+
     unittest.main()
 
@@ -2,65 +2,77 @@ from copy import deepcopy
 import gym
 import matplotlib.pyplot as plt
 
-from algorithms.sarsa import Sarsa
-from algorithms.double_sarsa import DoubleSarsa
-from algorithms.sarsa_n import SarsaN
-from algorithms.sarsa_lambda import SarsaLambda
-from algorithms.true_sarsa_lambda import TrueSarsaLambda
-from algorithms.qlearning import QLearning
-from algorithms.double_qlearning import DoubleQLearning
-from algorithms.expected_sarsa import ExpectedSarsa
-from algorithms.dynaq import DynaQ
-from algorithms.one_step_actor_critic import OneStepActorCritic
-
-from utils.operation_manager import run_repeatedly
+from utils.operation_manager import run_repeatedly, run_lockstep
+from utils.lockstep_env import make_lockstep_envs
+from utils.results_cache import ResultsCache
+from utils.metrics import open_sink, TaggedSink
+from algorithms.algorithm_selector import make_lockstep_agent, \
+    LOCKSTEP_ALGORITHMS
 
 
 from config import default_params
 
 
 
-def algorithm_test(env, params, num_episodes=500, num_repetitions=10):
+def algorithm_test(env, params, num_episodes=500, num_repetitions=10,
+                   workers=None, seed=None, cache_dir=None,
+                   metrics_path=None, instrumentation=None,
+                   lockstep=False):
     """
     Testing performance of an agent (or more agents) during learning.
     The performance is measured by the number of steps taken to complete
     the task, averaged over a number of independent runs.
+
+    workers : number of processes running the independent runs
+        (None - runs are run serially)
+    seed : base seed of the independent runs (None - not seeded)
+    cache_dir : directory of the results cache - seeded runs finished
+        before (by any script) are not run again (None - no cache)
+    metrics_path : file of records of episodes (CSV for ".csv" files,
+        lines of JSON otherwise) - records are tagged by the label of the
+        agent and the run (None - episode lengths are printed)
+    instrumentation : instrumentation of the runs (Instrumentation from
+        utils/instrumentation.py) - its totals over all runs are printed
+        (None - runs are not instrumented)
+    lockstep : True for learning the runs of agents of one step TD with
+        linear approximation in lockstep in one process (see LockstepTD) -
+        copies of the environment are simulated by numpy if possible
+        (see make_lockstep_envs), runs are neither cached nor
+        instrumented, other agents are run as without lockstep
     """
 
+    cache = None if cache_dir is None else ResultsCache(cache_dir)
+    sink = open_sink(metrics_path)
+
     alg_labels = []
     alg_data = []
 
     for (label, agent_params) in params:
 
-        if agent_params["algorithm"] == "sarsa":
-            RLAgent = Sarsa
-        elif agent_params["algorithm"] == "double_sarsa":
-            RLAgent = DoubleSarsa
-        elif agent_params["algorithm"] == "sarsa_n":
-            RLAgent = SarsaN
-        elif agent_params["algorithm"] == "sarsa_lambda":
-            RLAgent = SarsaLambda
-        elif agent_params["algorithm"] == "true_sarsa_lambda":
-            RLAgent = TrueSarsaLambda
-        elif agent_params["algorithm"] == "qlearning":
-            RLAgent = QLearning
-        elif agent_params["algorithm"] == "double_qlearning":
-            RLAgent = DoubleQLearning
-        elif agent_params["algorithm"] == "expected_sarsa":
-            RLAgent = ExpectedSarsa
-        elif agent_params["algorithm"] == "dynaq":
-            RLAgent = DynaQ
-        elif agent_params["algorithm"] == "osac":
-            RLAgent = OneStepActorCritic
+        if lockstep and agent_params["algorithm"] in LOCKSTEP_ALGORITHMS \
+                and agent_params["qfun_type"] == "linear_approx":
+            envs = make_lockstep_envs(env, num_repetitions)
+            agent = make_lockstep_agent(envs, num_repetitions,
+                                        agent_params)
+            data = run_lockstep(envs, agent, num_episodes, new_agent=True,
+                                training=True,
+                                sink=TaggedSink(sink, agent=label),
+                                seed=seed)
         else:
-            unimplemented
-
-        agent = RLAgent(env, **agent_params)
-        data = run_repeatedly(env, agent, num_episodes, num_repetitions,
-                              new_agent=True, training=True)
+            data = run_repeatedly(env, agent_params, num_episodes,
+                                  num_repetitions, new_agent=True,
+                                  training=True, workers=workers,
+                                  seed=seed, cache=cache,
+                                  sink=TaggedSink(sink, agent=label),
+                                  instrumentation=instrumentation)
         alg_labels.append(label)
         alg_data.append(data)
 
+    sink.close()
+
+    if instrumentation is not None:
+        print(instrumentation.report())
+
     def plot_learning_curve(steps_per_episodes, algs):
         plt.figure(figsize=(10,5))
         for i in range(len(steps_per_episodes)):
@@ -25,8 +25,9 @@ exploration = {
 discretization = {
 
     # coding types implemented:
-    #   "aggregating", "aggregating_simple", "tile", "tile_simple"
-    #   "rbf", "rbf_simple", "fourier", "fourier_simple"
+    #   "aggregating", "aggregating_simple", "tile", "tile_simple",
+    #   "tile_hashed", "rbf", "rbf_simple", "rbf_truncated",
+    #   "fourier", "fourier_simple", "fourier_bounded"
     "coding_type" : "tile",
 
     # number of dimensions depends on used model:
@@ -34,6 +35,27 @@ discretization = {
     #   Cart Pole : 4
     #   Acrobot : 6
     "granularity" : [4,4,4,4,4,4],
+
+    # tile_hashed specific parameters
+    #   - number of features the tiles are hashed onto
+    "memory_size" : 4096,
+
+    # rbf_truncated specific parameters
+    #   - only centers within the distance of rbf_cutoff bin widths
+    #     are evaluated
+    "rbf_cutoff" : 2.0,
+
+    # fourier_bounded specific parameters
+    #   - bound for total degree of frequency coefficients (sum of
+    #     frequencies over all dimensions)
+    #   - bound for number of dimensions combined in one feature
+    #     (None for no bound)
+    "fourier_degree" : 3,
+    "fourier_interactions" : None,
+
+    # numeric type of codings, weights and traces
+    #   "float64", "float32" (half of memory for large tables)
+    "dtype" : "float64",
 }
 
 
@@ -47,8 +69,14 @@ algorithm_params = {
     "algorithm" : "sarsa_lambda",
 
     # q function representation types:
-    #    "tabular", "linear_approx"
+    #    "tabular", "tabular_lazy", "linear_approx"
+    #    ("tabular_lazy" - tabular allocating visited cells only)
     "qfun_type" : "linear_approx",
+    # maximal number of cells of "tabular_lazy" (None for no limit,
+    # the least recently updated cells are evicted otherwise)
+    "max_cells" : None,
+    # file backing the q function table / weights (None - kept in RAM)
+    "storage_path" : None,
 
     # common learning parameters
     "alpha_w" : 0.01,
@@ -65,6 +93,10 @@ algorithm_params = {
     #   "replacing"   - only for tabular q function representation
     #   "dutch" - only for lin approx q fun representation
     "et_type" : "accumulating",
+    # traces decayed below the cutoff are dropped (0 - traces are kept
+    # until the end of an episode, None - the default: TRACE_CUTOFF in
+    # utils/sparse_trace.py, exact traces of true online Sarsa(lambda))
+    "trace_cutoff" : None,
 
     # dynaq specific parameters
     "plan_rep" : 10,
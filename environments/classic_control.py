@@ -0,0 +1,350 @@
+from math import pi
+
+import numpy as np
+import gym.spaces as gsp
+
+
+
+class VectorEnv():
+    """
+    N copies of a classic control environment simulated by numpy - states
+    of all copies are rows of one array and a step of all copies is one
+    vectorized computation (no gym wrappers). Dynamics, initial states and
+    time limits follow gym (the i-th copy reset with seed + i draws the
+    same initial states as gym's environment reset with seed + i), so
+    trajectories match gym's ones - up to the last bit of Acrobot's states
+    (gym squares velocities of Acrobot by pow of numpy scalars, which
+    rounds differently from squares of arrays in rare cases).
+
+    With autoreset, copies whose episode ended are reset within the step -
+    their returned states are initial states of new episodes, last states
+    of the ended episodes are kept in final_states. Without autoreset,
+    copies are stepped only while active (see LockstepEnv).
+    """
+    max_episode_steps = None
+
+    def __init__(self, num_envs, autoreset=True):
+
+        self.num_envs = num_envs
+        self.autoreset = autoreset
+
+        # Coders recognize the environment by its unwrapped type.
+        self.unwrapped = self
+        self.spec = None
+
+        self.rngs = None
+        self.states = None
+        self.elapsed = np.zeros(num_envs, dtype=int)
+        self.final_states = None
+
+    def reset(self, seed=None):
+        """
+        seed: if given then the i-th copy is seeded by seed + i (random
+            seeds are used for the first reset otherwise)
+
+        return: initial states, shape (copies, state dimensions)
+        """
+        if seed is not None:
+            self.rngs = [np.random.default_rng(seed + i)
+                         for i in range(self.num_envs)]
+        elif self.rngs is None:
+            self.rngs = [np.random.default_rng()
+                         for _ in range(self.num_envs)]
+
+        self.states = np.array([self._initial_state(rng)
+                                for rng in self.rngs], dtype=float)
+        self.elapsed[:] = 0
+
+        return self._initial_observations(self.states)
+
+    def step(self, actions, active=None):
+        """
+        actions: actions of copies, shape (copies,)
+        active: mask of copies being stepped (all copies if not given)
+
+        return: states, rewards and ends of episodes (terminated or
+            truncated by the time limit) of copies
+        """
+        if active is None or active.all():
+            rows = slice(None)
+        else:
+            rows = np.flatnonzero(active)
+
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        self.states[rows], rewards[rows], dones[rows] = \
+            self._step(self.states[rows], np.asarray(actions)[rows])
+
+        self.elapsed[rows] += 1
+        dones[rows] |= self.elapsed[rows] >= self.max_episode_steps
+
+        observations = self._observations(self.states)
+
+        if self.autoreset and dones.any():
+            self.final_states = observations.copy()
+            for i in np.flatnonzero(dones):
+                self.states[i] = self._initial_state(self.rngs[i])
+            self.elapsed[dones] = 0
+            observations[dones] = \
+                self._initial_observations(self.states[dones])
+
+        return observations, rewards, dones
+
+    def _initial_state(self, rng):
+        unimplemented
+
+    def _step(self, states, actions):
+        """
+        return: next states, rewards and terminations of given copies
+        """
+        unimplemented
+
+    def _observations(self, states):
+        return states.astype(np.float32)
+
+    def _initial_observations(self, states):
+        return self._observations(states)
+
+
+class MountainCarVectorEnv(VectorEnv):
+    """
+    MountainCar-v0
+    """
+    max_episode_steps = 200
+
+    min_position = -1.2
+    max_position = 0.6
+    max_speed = 0.07
+    goal_position = 0.5
+    goal_velocity = 0
+    force = 0.001
+    gravity = 0.0025
+
+    def __init__(self, num_envs, autoreset=True):
+
+        super().__init__(num_envs, autoreset)
+
+        low = np.array([self.min_position, -self.max_speed], np.float32)
+        high = np.array([self.max_position, self.max_speed], np.float32)
+
+        self.observation_space = gsp.Box(low, high, dtype=np.float32)
+        self.action_space = gsp.Discrete(3)
+
+    def _initial_state(self, rng):
+        return [rng.uniform(low=-0.6, high=-0.4), 0]
+
+    def _step(self, states, actions):
+        position = states[:, 0]
+        velocity = states[:, 1]
+
+        velocity = velocity + ((actions - 1) * self.force +
+                               np.cos(3 * position) * (-self.gravity))
+        velocity = np.clip(velocity, -self.max_speed, self.max_speed)
+        position = np.clip(position + velocity,
+                           self.min_position, self.max_position)
+        velocity[(position == self.min_position) & (velocity < 0)] = 0
+
+        terminated = ((position >= self.goal_position) &
+                      (velocity >= self.goal_velocity))
+        rewards = np.full(len(states), -1.0)
+
+        return np.stack((position, velocity), axis=1), rewards, terminated
+
+
+class CartPoleVectorEnv(VectorEnv):
+    """
+    CartPole-v1
+    """
+    max_episode_steps = 500
+
+    gravity = 9.8
+    masscart = 1.0
+    masspole = 0.1
+    total_mass = masspole + masscart
+    length = 0.5
+    polemass_length = masspole * length
+    force_mag = 10.0
+    tau = 0.02
+
+    theta_threshold_radians = 12 * 2 * pi / 360
+    x_threshold = 2.4
+
+    def __init__(self, num_envs, autoreset=True):
+
+        super().__init__(num_envs, autoreset)
+
+        high = np.array([self.x_threshold * 2, np.finfo(np.float32).max,
+                         self.theta_threshold_radians * 2,
+                         np.finfo(np.float32).max], dtype=np.float32)
+
+        self.observation_space = gsp.Box(-high, high, dtype=np.float32)
+        self.action_space = gsp.Discrete(2)
+
+    def _initial_state(self, rng):
+        return rng.uniform(low=-0.05, high=0.05, size=(4,))
+
+    def _step(self, states, actions):
+        x, x_dot, theta, theta_dot = states.T
+
+        force = np.where(actions == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        temp = (force + self.polemass_length * theta_dot**2 * sintheta) \
+            / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * costheta**2
+                           / self.total_mass))
+        xacc = temp - self.polemass_length * thetaacc * costheta \
+            / self.total_mass
+
+        # Euler integration
+        x = x + self.tau * x_dot
+        x_dot = x_dot + self.tau * xacc
+        theta = theta + self.tau * theta_dot
+        theta_dot = theta_dot + self.tau * thetaacc
+
+        terminated = ((x < -self.x_threshold) | (x > self.x_threshold) |
+                      (theta < -self.theta_threshold_radians) |
+                      (theta > self.theta_threshold_radians))
+        rewards = np.ones(len(states))
+
+        return np.stack((x, x_dot, theta, theta_dot), axis=1), rewards, \
+            terminated
+
+
+class AcrobotVectorEnv(VectorEnv):
+    """
+    Acrobot-v1 (dynamics of the book, no torque noise)
+    """
+    max_episode_steps = 500
+
+    dt = 0.2
+
+    LINK_LENGTH_1 = 1.0
+    LINK_MASS_1 = 1.0
+    LINK_MASS_2 = 1.0
+    LINK_COM_POS_1 = 0.5
+    LINK_COM_POS_2 = 0.5
+    LINK_MOI = 1.0
+
+    MAX_VEL_1 = 4 * pi
+    MAX_VEL_2 = 9 * pi
+
+    AVAIL_TORQUE = np.array([-1.0, 0.0, +1])
+
+    def __init__(self, num_envs, autoreset=True):
+
+        super().__init__(num_envs, autoreset)
+
+        high = np.array([1.0, 1.0, 1.0, 1.0, self.MAX_VEL_1, self.MAX_VEL_2],
+                        dtype=np.float32)
+
+        self.observation_space = gsp.Box(-high, high, dtype=np.float32)
+        self.action_space = gsp.Discrete(3)
+
+    def _initial_state(self, rng):
+        return rng.uniform(low=-0.1, high=0.1, size=(4,)).astype(np.float32)
+
+    def _step(self, states, actions):
+        torque = self.AVAIL_TORQUE[actions]
+        s_augmented = np.column_stack((states, torque))
+
+        # Runge-Kutta (4th order) integration over one time step
+        dt = self.dt
+        dt2 = dt / 2.0
+        k1 = self._dsdt(s_augmented)
+        k2 = self._dsdt(s_augmented + dt2 * k1)
+        k3 = self._dsdt(s_augmented + dt2 * k2)
+        k4 = self._dsdt(s_augmented + dt * k3)
+        ns = (s_augmented + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4))[:, :4]
+
+        ns[:, 0] = self._wrap(ns[:, 0], -pi, pi)
+        ns[:, 1] = self._wrap(ns[:, 1], -pi, pi)
+        ns[:, 2] = np.minimum(np.maximum(ns[:, 2], -self.MAX_VEL_1),
+                              self.MAX_VEL_1)
+        ns[:, 3] = np.minimum(np.maximum(ns[:, 3], -self.MAX_VEL_2),
+                              self.MAX_VEL_2)
+
+        terminated = -np.cos(ns[:, 0]) - np.cos(ns[:, 1] + ns[:, 0]) > 1.0
+        rewards = np.where(terminated, 0.0, -1.0)
+
+        return ns, rewards, terminated
+
+    def _observations(self, states):
+        theta1, theta2, dtheta1, dtheta2 = states.T
+
+        return np.stack((np.cos(theta1), np.sin(theta1), np.cos(theta2),
+                         np.sin(theta2), dtheta1, dtheta2),
+                        axis=1).astype(np.float32)
+
+    def _initial_observations(self, states):
+        # Initial states are single precision - gym computes their
+        # observations in single precision too.
+        return self._observations(states.astype(np.float32))
+
+    def _wrap(self, x, m, M):
+        diff = M - m
+        while (x > M).any():
+            x = np.where(x > M, x - diff, x)
+        while (x < m).any():
+            x = np.where(x < m, x + diff, x)
+
+        return x
+
+    def _dsdt(self, s_augmented):
+        m1 = self.LINK_MASS_1
+        m2 = self.LINK_MASS_2
+        l1 = self.LINK_LENGTH_1
+        lc1 = self.LINK_COM_POS_1
+        lc2 = self.LINK_COM_POS_2
+        I1 = self.LINK_MOI
+        I2 = self.LINK_MOI
+        g = 9.8
+        a = s_augmented[:, 4]
+        theta1, theta2, dtheta1, dtheta2 = s_augmented[:, :4].T
+
+        d1 = (m1 * lc1**2
+              + m2 * (l1**2 + lc2**2 + 2 * l1 * lc2 * np.cos(theta2))
+              + I1 + I2)
+        d2 = m2 * (lc2**2 + l1 * lc2 * np.cos(theta2)) + I2
+        phi2 = m2 * lc2 * g * np.cos(theta1 + theta2 - pi / 2.0)
+        phi1 = (-m2 * l1 * lc2 * dtheta2**2 * np.sin(theta2)
+                - 2 * m2 * l1 * lc2 * dtheta2 * dtheta1 * np.sin(theta2)
+                + (m1 * lc1 + m2 * l1) * g * np.cos(theta1 - pi / 2)
+                + phi2)
+        ddtheta2 = (a + d2 / d1 * phi1
+                    - m2 * l1 * lc2 * dtheta1**2 * np.sin(theta2)
+                    - phi2) / (m2 * lc2**2 + I2 - d2**2 / d1)
+        ddtheta1 = -(d2 * ddtheta2 + phi1) / d1
+
+        return np.stack((dtheta1, dtheta2, ddtheta1, ddtheta2,
+                         np.zeros(len(a))), axis=1)
+
+
+VECTOR_ENVS = {"MountainCar-v0": MountainCarVectorEnv,
+               "CartPole-v1": CartPoleVectorEnv,
+               "Acrobot-v1": AcrobotVectorEnv}
+
+
+def make_vector_env(env_id, num_envs, autoreset=True,
+                    max_episode_steps=None):
+    """
+    env_id: gym id of the simulated environment
+        example: "CartPole-v1"
+    num_envs: number of copies stepped together
+    autoreset: True for resetting copies at the end of their episodes
+    max_episode_steps: time limit of episodes (None - gym's one)
+
+    return: vectorized environment
+    """
+    if env_id in VECTOR_ENVS:
+        envs = VECTOR_ENVS[env_id](num_envs, autoreset)
+    else:
+        unimplemented
+
+    if max_episode_steps is not None:
+        envs.max_episode_steps = max_episode_steps
+
+    return envs
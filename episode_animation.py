@@ -1,15 +1,6 @@
 import gym
 
-from algorithms.sarsa import Sarsa
-from algorithms.double_sarsa import DoubleSarsa
-from algorithms.sarsa_n import SarsaN
-from algorithms.sarsa_lambda import SarsaLambda
-from algorithms.true_sarsa_lambda import TrueSarsaLambda
-from algorithms.qlearning import QLearning
-from algorithms.double_qlearning import DoubleQLearning
-from algorithms.expected_sarsa import ExpectedSarsa
-from algorithms.dynaq import DynaQ
-from algorithms.one_step_actor_critic import OneStepActorCritic
+from algorithms.algorithm_selector import make_agent
 
 from utils.operation_manager import run_episodes
 
@@ -27,30 +18,7 @@ def animation_test(env, params, num_episodes=500):
     num_episodes : number episodes used for training
     """
 
-    if params["algorithm"] == "sarsa":
-        RLAgent = Sarsa
-    elif params["algorithm"] == "double_sarsa":
-        RLAgent = DoubleSarsa
-    elif params["algorithm"] == "sarsa_n":
-        RLAgent = SarsaN
-    elif params["algorithm"] == "sarsa_lambda":
-        RLAgent = SarsaLambda
-    elif params["algorithm"] == "true_sarsa_lambda":
-        RLAgent = TrueSarsaLambda
-    elif params["algorithm"] == "qlearning":
-        RLAgent = QLearning
-    elif params["algorithm"] == "double_qlearning":
-        RLAgent = DoubleQLearning
-    elif params["algorithm"] == "expected_sarsa":
-        RLAgent = ExpectedSarsa
-    elif params["algorithm"] == "dynaq":
-        RLAgent = DynaQ
-    elif params["algorithm"] == "osac":
-        RLAgent = OneStepActorCritic
-    else:
-        unimplemented
-
-    agent = RLAgent(env, **params)
+    agent = make_agent(env, params)
     run_episodes(env, agent, num_episodes, new_agent=True, training=True)
 
     menv = gym.wrappers.Monitor(env, './video/', force=True)
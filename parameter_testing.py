@@ -1,27 +1,26 @@
+from copy import deepcopy
 import gym
 import matplotlib.pyplot as plt
 
-from algorithms.sarsa import Sarsa
-from algorithms.double_sarsa import DoubleSarsa
-from algorithms.sarsa_n import SarsaN
-from algorithms.sarsa_lambda import SarsaLambda
-from algorithms.true_sarsa_lambda import TrueSarsaLambda
-from algorithms.qlearning import QLearning
-from algorithms.double_qlearning import DoubleQLearning
-from algorithms.expected_sarsa import ExpectedSarsa
-from algorithms.dynaq import DynaQ
-from algorithms.one_step_actor_critic import OneStepActorCritic
-
-from utils.operation_manager import run_repeatedly
+from utils.operation_manager import run_many, run_halving
+from utils.results_cache import ResultsCache
+from utils.metrics import open_sink
 
 from config import default_params as params
 
 
+# Name of the dummy second parameter of one parameter tests (a label of
+# the plot only, not a parameter of agents).
+DUMMY_PARAM = "other_params"
+
 
 def grid_test(env, default_params,
                    primary_param_name, primary_param_values,
                    secondary_param_name, secondary_param_values,
-                   num_episodes=200, num_repetitions=10, skip_episodes=100):
+                   num_episodes=200, num_repetitions=10, skip_episodes=100,
+                   workers=None, seed=None,
+                   min_episodes=None, eta=3, maximize=False,
+                   cache_dir=None, metrics_path=None, instrumentation=None):
     """
     Testing dependence of learning performance on values of two
     parameters (the other parameters keep their default values).
@@ -40,59 +39,109 @@ def grid_test(env, default_params,
     num_repetitions : number of independent runs
     skip_episodes : number of skipped episodes at the beginning of
         each independent run
+    workers : number of processes running independent runs of all
+        combinations (None - runs are run serially)
+    seed : base seed of the independent runs (None - not seeded)
+    min_episodes : if given then combinations are tested by successive
+        halving - all combinations run min_episodes episodes first and
+        only the best 1/eta of them continue with eta times more episodes
+        (up to num_episodes), only combinations reaching num_episodes
+        are plotted
+    eta : reduction factor of successive halving
+    maximize : True if more steps per episode are better (cart pole)
+    cache_dir : directory of the results cache - seeded runs finished
+        before (by any script) are not run again (None - no cache)
+    metrics_path : file of records of episodes (CSV for ".csv" files,
+        lines of JSON otherwise) - records are tagged by the index of the
+        combination and the run (None - episode lengths are printed)
+    instrumentation : instrumentation of the runs (Instrumentation from
+        utils/instrumentation.py) - its totals over all runs are printed
+        (None - runs are not instrumented)
     """
 
     assert num_episodes > skip_episodes and skip_episodes >= 0, \
         "Suspicious number of episodes"
     assert num_repetitions > 0, "Nothing to average"
 
-    # container for collecting test results
-    data = []
+    cache = None if cache_dir is None else ResultsCache(cache_dir)
+    sink = open_sink(metrics_path)
 
+    # Each cell of the grid is given by its own copy of parameters, so
+    # cells (and their repetitions) are independent tasks.
+    cells = []
     for p2 in secondary_param_values:
-        default_params[secondary_param_name] = p2
-
-        data_part = []
         for p1 in primary_param_values:
-            default_params[primary_param_name] = p1
-
-            if default_params["algorithm"] == "sarsa":
-                RLAgent = Sarsa
-            elif default_params["algorithm"] == "double_sarsa":
-                RLAgent = DoubleSarsa
-            elif default_params["algorithm"] == "sarsa_n":
-                RLAgent = SarsaN
-            elif default_params["algorithm"] == "sarsa_lambda":
-                RLAgent = SarsaLambda
-            elif default_params["algorithm"] == "true_sarsa_lambda":
-                RLAgent = TrueSarsaLambda
-            elif default_params["algorithm"] == "qlearning":
-                RLAgent = QLearning
-            elif default_params["algorithm"] == "double_qlearning":
-                RLAgent = DoubleQLearning
-            elif default_params["algorithm"] == "expected_sarsa":
-                RLAgent = ExpectedSarsa
-            elif default_params["algorithm"] == "dynaq":
-                RLAgent = DynaQ
-            elif default_params["algorithm"] == "osac":
-                RLAgent = OneStepActorCritic
-            else:
-                unimplemented
+            cell_params = deepcopy(default_params)
+            # Agents of one parameter tests are the same as agents of other
+            # scripts (they share the results cache).
+            if secondary_param_name != DUMMY_PARAM:
+                cell_params[secondary_param_name] = p2
+            cell_params[primary_param_name] = p1
+            cells.append(cell_params)
+
+    def cell_name(index):
+        p2 = secondary_param_values[index // len(primary_param_values)]
+        p1 = primary_param_values[index % len(primary_param_values)]
+        return "%s = %s , %s = %s" % (secondary_param_name, p2,
+                                      primary_param_name, p1)
+
+    if min_episodes is None:
+
+        def performance(avg_episode_lengths):
+            x = avg_episode_lengths[skip_episodes:]
+            return sum(x)/len(x)
+
+        def report(index, avg_episode_lengths):
+            print(cell_name(index), ":", performance(avg_episode_lengths))
+
+        results = run_many(env, cells, num_episodes, num_repetitions,
+                           training=True, workers=workers, seed=seed,
+                           callback=report, cache=cache, sink=sink,
+                           instrumentation=instrumentation)
+        performances = [performance(x) for x in results]
+
+    else:
 
-            agent = RLAgent(env,**default_params)
+        def report(index, episodes, performance):
+            print(cell_name(index), ":", performance, "after", episodes,
+                  "episodes")
 
-            x = run_repeatedly(env, agent, num_episodes, num_repetitions,
-                               new_agent=True, training=True)
-            x = x[skip_episodes:]
-            x = sum(x)/len(x)
-            data_part.append(x)
+        reached, used_episodes = run_halving(
+            env, cells, num_episodes, num_repetitions, True,
+            skip_episodes, min_episodes, eta, maximize,
+            workers=workers, seed=seed, callback=report, cache=cache,
+            sink=sink, instrumentation=instrumentation)
+
+        # Stopped combinations are not plotted.
+        performances = [performance if episodes == num_episodes
+                        else float("nan")
+                        for episodes, performance in reached]
+
+        print("surviving combinations:")
+        for index, (episodes, performance) in enumerate(reached):
+            if episodes == num_episodes:
+                print("   ", cell_name(index), ":", performance)
+        all_episodes = len(cells) * num_repetitions * num_episodes
+        print("episodes run:", used_episodes, "of", all_episodes,
+              "(saved %.1f %%)" % (100 * (1 - used_episodes/all_episodes)))
+
+    sink.close()
+
+    if instrumentation is not None:
+        print(instrumentation.report())
+
+    # container for collecting test results
+    data = []
+    for i in range(len(secondary_param_values)):
+        data_part = performances[i * len(primary_param_values):
+                                 (i + 1) * len(primary_param_values)]
         data.append(data_part)
 
     def plot_grid_search(x, xlabel, ys, ylabel, ylabels):
         x = [ str(y) for y in x]
         plt.figure(figsize=(5,5))
         for i in range(len(ylabels)):
-            if ylabel == "other_params":
+            if ylabel == DUMMY_PARAM:
                 plt.plot(x, ys[i], marker='o')
             else:
                 plt.plot(x, ys[i], marker='o', label=ylabel+"="+str(ylabels[i]))
@@ -100,7 +149,7 @@ def grid_test(env, default_params,
         plt.ylabel("average number of steps")
         #plt.title("Grid search")
         plt.xticks(x)
-        if ylabel != "other_params":
+        if ylabel != DUMMY_PARAM:
             plt.legend(loc="upper right")
         plt.show()
 
@@ -133,7 +182,7 @@ def one_parameter_test(env, default_params,
     dummy parameter.
     """
 
-    dummy_param_name = "other_params"
+    dummy_param_name = DUMMY_PARAM
     dummy_param_values = ["defaults"]
 
     grid_test(env,default_params,
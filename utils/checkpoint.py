@@ -0,0 +1,53 @@
+import numpy as np
+
+
+
+def prefixed(prefix, state):
+    """
+    return: the state with names of its arrays prefixed (for storing
+        states of nested parts within one state)
+    """
+    return {prefix + "." + name: value for name, value in state.items()}
+
+
+def unprefixed(prefix, state):
+    """
+    return: the part of the state with names prefixed by prefix (prefix
+        is removed from names)
+    """
+    prefix = prefix + "."
+    return {name[len(prefix):]: value for name, value in state.items()
+            if name.startswith(prefix)}
+
+
+def save_checkpoint(path, components, **arrays):
+    """
+    path: file the state of an agent is written into (.npz)
+    components: named parts of the agent (Q functions, policies, ...)
+        providing get_state() and set_state(state)
+        example: {"qfunction": qfunction, "policy": policy}
+    arrays: other arrays of the agent
+        example: dynaq model -> model_rewards=[...], ...
+    """
+    state = prefixed("agent", arrays)
+    for name, component in components.items():
+        state.update(prefixed(name, component.get_state()))
+
+    np.savez(path, **state)
+
+
+def load_checkpoint(path, components):
+    """
+    path: file written by save_checkpoint
+    components: named parts of the agent the state is loaded into (the
+        same parts as for saving)
+
+    return: other arrays of the agent
+    """
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+
+    for name, component in components.items():
+        component.set_state(unprefixed(name, state))
+
+    return unprefixed("agent", state)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.checkpoint import prefixed, unprefixed
+
+
+
+class CodingCache():
+    """
+    Coder remembering encodings of the most recently encoded states.
+
+    Within one step the same states are encoded repeatedly (values of all
+    actions, update of the previous state, value of the next state) - the
+    cache is keyed by the content of a state (not by its identity), so
+    states being equal give the same encoding even if they are different
+    objects. The least recently used encodings are evicted.
+    """
+    def __init__(self, discretizer, size=8):
+
+        self.discretizer = discretizer
+        self.size = size
+
+        self.codings = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state, **kwargs):
+
+        # Batches of states are encoded directly.
+        if np.ndim(state) != 1:
+            return self.discretizer(state, **kwargs)
+
+        state = np.asarray(state)
+        key = (state.dtype.str, state.tobytes(),
+               tuple(sorted(kwargs.items())))
+
+        coding = self.codings.get(key)
+        if coding is not None:
+            self.hits += 1
+            self.codings.move_to_end(key)
+            return coding
+
+        self.misses += 1
+        coding = self.discretizer(state, **kwargs)
+
+        # Cached encodings are shared - they must not be modified.
+        if isinstance(coding, np.ndarray):
+            coding.flags.writeable = False
+
+        self.codings[key] = coding
+        if len(self.codings) > self.size:
+            self.codings.popitem(last=False)
+
+        return coding
+
+    def __getattr__(self, name):
+
+        # Attributes of the coder (e.g. index hash table of hashed tile
+        # coding) are accessible through the cache.
+        if name == "discretizer":
+            raise AttributeError(name)
+
+        return getattr(self.discretizer, name)
+
+    def clear(self):
+
+        self.codings.clear()
+
+    def reset(self):
+
+        # Index hash table of hashed tile coding is learned - a new agent
+        # starts with an empty one (and cached encodings of the old one
+        # are dropped).
+        self.clear()
+        if hasattr(self.discretizer, "iht"):
+            self.discretizer.iht.reset()
+
+    def get_state(self):
+
+        # Only the index hash table of hashed tile coding changes while
+        # learning, other coders are given by their construction.
+        if hasattr(self.discretizer, "iht"):
+            return prefixed("iht", self.discretizer.iht.get_state())
+
+        return {}
+
+    def set_state(self, state):
+
+        self.clear()
+        if hasattr(self.discretizer, "iht"):
+            self.discretizer.iht.set_state(unprefixed("iht", state))
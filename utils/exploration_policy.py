@@ -1,15 +1,21 @@
-import random
-import sys
-from math import exp, log, isclose
+import numpy as np
+from math import exp, isnan
 
 
 
 class ExplorationPolicy():
+    """
+    Selection of actions given their q values - q values of one state
+    (shape (actions,)) or of a batch of states (shape (states, actions),
+    one action is selected for each state). Random numbers are drawn from
+    the global numpy generator (np.random.seed).
+    """
     def __init__(self, actions, policy,
                  epsilon, epsilon_decay, min_epsilon, temperature, **kwargs):
 
         self.actions = actions
         self.nactions = len(self.actions)
+        self.action_array = np.array(self.actions)
 
         self.policy = policy    # "epsilon_greedy", "softmax", "max_boltzmann"
 
@@ -19,7 +25,6 @@ class ExplorationPolicy():
         self.epsilon = None
 
         self.temperature = temperature
-        self.threshold = log(sys.float_info.max)
 
     def reset(self):
 
@@ -32,70 +37,213 @@ class ExplorationPolicy():
             self.epsilon = max(self.epsilon * self.epsilon_decay,
                                self.min_epsilon)
 
+    def get_state(self):
+
+        epsilon = float("nan") if self.epsilon is None else self.epsilon
+
+        return {"epsilon": epsilon}
+
+    def set_state(self, state):
+
+        epsilon = float(state["epsilon"])
+        self.epsilon = None if isnan(epsilon) else epsilon
+
+    def _max_qvalue(self, qvalues):
+
+        # NaN q values (of diverged weights) are skipped - max() returns
+        # NaN only if the first q value is NaN.
+        max_qvalue = max(qvalues)
+        if isnan(max_qvalue):
+            numbers = [x for x in qvalues if not isnan(x)]
+            if numbers:
+                max_qvalue = max(numbers)
+
+        return max_qvalue
+
+    def _softmax(self, qvalues):
+
+        # Shifting by the maximum (log-sum-exp) keeps exponents finite
+        # for any q values and temperature (also infinite maximum).
+        max_qvalue = self._max_qvalue(qvalues)
+        dist = [1.0 if x == max_qvalue
+                else exp((x - max_qvalue) / self.temperature)
+                for x in qvalues]
+        pow_sum = sum(dist)
+
+        # Actions with NaN q values are not selected (all actions are
+        # equally probable if no q value is a number).
+        if isnan(pow_sum):
+            dist = [0.0 if isnan(x) else x for x in dist]
+            pow_sum = sum(dist)
+        if not 0.0 < pow_sum < float("inf"):
+            return [1 / self.nactions for _ in qvalues]
+
+        return [x / pow_sum for x in dist]
+
+    def _best_index(self, qvalues):
+
+        max_qvalue = self._max_qvalue(qvalues)
+        candidates = [i for i, x in enumerate(qvalues) if x == max_qvalue]
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        # No q value is a number - a random action.
+        if not candidates:
+            return np.random.randint(self.nactions)
+
+        return candidates[np.random.randint(len(candidates))]
+
+    def _sample_index(self, dist):
+
+        u = np.random.random_sample()
+        cumulative = 0.0
+        for i, prob in enumerate(dist):
+            cumulative += prob
+            if u < cumulative:
+                return i
+
+        return self.nactions - 1
+
     def get_distribution(self, qvalues):
 
+        if np.ndim(qvalues) == 2:
+            return self._batch_get_distribution(self._batch_qvalues(qvalues))
+        qvalues = list(qvalues)
+
         if self.policy == "epsilon_greedy":
 
             dist = [self.epsilon/self.nactions for _ in qvalues]
-
-            idx = self.actions.index(self.best_action(qvalues))
-            dist[idx] += 1 - self.epsilon
+            dist[self._best_index(qvalues)] += 1 - self.epsilon
 
         elif self.policy == "softmax":
 
-            max_qvalue = max(qvalues)
-            if max_qvalue / self.temperature > self.threshold:
-                temperature = max_qvalue / self.threshold + 0.001
-            else:
-                temperature = self.temperature
+            dist = self._softmax(qvalues)
 
-            dist = [exp(x/temperature) for x in qvalues]
-            pow_sum = sum(dist)
+        elif self.policy == "max_boltzmann":
 
-            if isclose(pow_sum, 0.0, abs_tol=1e-300):
-                dist = [1/self.nactions for _ in dist]
-            else:
-                dist = [x/pow_sum for x in dist]
+            dist = [self.epsilon * x for x in self._softmax(qvalues)]
+            dist[self._best_index(qvalues)] += 1 - self.epsilon
 
-        elif self.policy == "max_boltzmann":
+        else:
+            unimplemented
 
-            max_qvalue = max(qvalues)
-            if max_qvalue / self.temperature > self.threshold:
-                temperature = max_qvalue / self.threshold + 0.001
-            else:
-                temperature = self.temperature
+        return np.array(dist)
 
-            dist = [exp(x/temperature) for x in qvalues]
-            pow_sum = sum(dist)
+    def get_action(self, qvalues):
+
+        if np.ndim(qvalues) == 2:
+            return self.action_array[
+                self._batch_get_indices(self._batch_qvalues(qvalues))]
+        qvalues = list(qvalues)
 
-            if isclose(pow_sum, 0.0, abs_tol=1e-300):
-                dist = [self.epsilon/self.nactions for _ in dist]
+        # Exploring and greedy choices are drawn separately - the
+        # distribution is not needed for greedy choices.
+        if self.policy == "epsilon_greedy":
+            if np.random.random_sample() < self.epsilon:
+                idx = np.random.randint(self.nactions)
             else:
-                dist = [self.epsilon*x/pow_sum for x in dist]
+                idx = self._best_index(qvalues)
 
-            idx = self.actions.index(self.best_action(qvalues))
-            dist[idx] += 1 - self.epsilon
+        elif self.policy == "softmax":
+            idx = self._sample_index(self._softmax(qvalues))
+
+        elif self.policy == "max_boltzmann":
+            if np.random.random_sample() < self.epsilon:
+                idx = self._sample_index(self._softmax(qvalues))
+            else:
+                idx = self._best_index(qvalues)
 
         else:
             unimplemented
 
-        return dist
+        return self.actions[idx]
 
-    def get_action(self, qvalues):
+    def best_action(self, qvalues):
 
-        probs = self.get_distribution(qvalues)
-        [action] = random.choices(self.actions, probs)
+        if np.ndim(qvalues) == 2:
+            return self.action_array[
+                self._batch_best_indices(self._batch_qvalues(qvalues))]
 
-        return action
+        return self.actions[self._best_index(list(qvalues))]
 
-    def best_action(self, qvalues):
+    def _batch_qvalues(self, qvalues):
+
+        # NaN q values are replaced by -inf (never the best, zero
+        # probabilities) - rows without numbers by zeros (random actions).
+        qvalues = np.asarray(qvalues, dtype=float)
+
+        nans = np.isnan(qvalues)
+        if nans.any():
+            qvalues = np.where(nans, -np.inf, qvalues)
+            qvalues[nans.all(axis=1)] = 0.0
+
+        return qvalues
+
+    def _batch_softmax(self, qvalues):
+
+        x = (qvalues - qvalues.max(axis=1, keepdims=True)) / self.temperature
+        # Infinite maximum (inf - inf) - its shifted q values are zeros.
+        x[np.isnan(x)] = 0.0
+        dist = np.exp(x)
+
+        return dist / dist.sum(axis=1, keepdims=True)
+
+    def _batch_best_indices(self, qvalues):
+
+        # Ties are broken by random keys of best actions.
+        best = qvalues == qvalues.max(axis=1, keepdims=True)
+        keys = np.where(best, np.random.random_sample(qvalues.shape), -1.0)
+
+        return keys.argmax(axis=1)
+
+    def _batch_sample_indices(self, dist):
+
+        cumulative = dist.cumsum(axis=1)
+        u = np.random.random_sample((len(dist), 1))
+        indices = (cumulative < u * cumulative[:, -1:]).sum(axis=1)
 
-        shuffled_actions = list(zip(self.actions[:], qvalues[:]))
-        random.shuffle(shuffled_actions)
+        return np.minimum(indices, self.nactions - 1)
 
-        best_action, maxq = shuffled_actions[0]
-        for a, q in shuffled_actions:
-            if q > maxq:
-                best_action, maxq = a, q
+    def _batch_get_distribution(self, qvalues):
+        """
+        qvalues: q values of a batch of states, shape (states, actions)
+
+        return: distributions of actions, shape (states, actions)
+        """
+        if self.policy == "epsilon_greedy":
+            dist = np.full(qvalues.shape, self.epsilon / self.nactions)
+        elif self.policy == "softmax":
+            return self._batch_softmax(qvalues)
+        elif self.policy == "max_boltzmann":
+            dist = self.epsilon * self._batch_softmax(qvalues)
+        else:
+            unimplemented
+
+        best = self._batch_best_indices(qvalues)
+        dist[np.arange(len(dist)), best] += 1 - self.epsilon
+
+        return dist
+
+    def _batch_get_indices(self, qvalues):
+        """
+        qvalues: q values of a batch of states, shape (states, actions)
+
+        return: indices of selected actions, shape (states,)
+        """
+        if self.policy == "softmax":
+            return self._batch_sample_indices(self._batch_softmax(qvalues))
+
+        indices = self._batch_best_indices(qvalues)
+        explore = np.random.random_sample(len(qvalues)) < self.epsilon
+
+        if self.policy == "epsilon_greedy":
+            random_indices = np.random.randint(self.nactions,
+                                               size=len(qvalues))
+        elif self.policy == "max_boltzmann":
+            random_indices = self._batch_sample_indices(
+                self._batch_softmax(qvalues))
+        else:
+            unimplemented
 
-        return best_action
+        return np.where(explore, random_indices, indices)
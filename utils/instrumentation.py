@@ -0,0 +1,298 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+
+
+# Phases of methods of components of agents (Q functions, V functions
+# and policies) - calls of coders are timed as "encode", steps of the
+# environment as "env_step", the rest of act() of the agent as "act" and
+# planning of Dyna-Q as "planning".
+PHASES = {"value": "evaluate", "values": "evaluate", "update": "update",
+          "learn": "update", "get_action": "policy",
+          "best_action": "policy", "get_distribution": "policy"}
+
+
+class _TimedCoder():
+    """
+    Coder whose calls are timed as encoding (other attributes are the
+    attributes of the coder).
+    """
+    def __init__(self, coder, timer):
+
+        self.coder = coder
+        self.timer = timer
+
+    def __call__(self, *args, **kwargs):
+
+        self.timer.start("encode")
+        try:
+            return self.coder(*args, **kwargs)
+        finally:
+            self.timer.stop()
+
+    def __getattr__(self, name):
+
+        return getattr(self.coder, name)
+
+
+class PhaseTimer():
+    """
+    Numbers of calls and wall times of phases of steps. Phases are timed
+    in total (including nested phases - e.g. updates of planning) and own
+    (excluding nested phases), so own times of phases add up to the
+    timed time.
+    """
+    def __init__(self):
+
+        self.calls = {}
+        self.total = {}
+        self.own = {}
+
+        self._stack = []
+        self._mark = 0.0
+        self._wrapped = []
+
+    def start(self, phase):
+
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1][0]
+            self.own[outer] = self.own.get(outer, 0.0) + now - self._mark
+        self._stack.append((phase, now))
+        self._mark = now
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def stop(self):
+
+        now = time.perf_counter()
+        phase, started = self._stack.pop()
+        self.own[phase] = self.own.get(phase, 0.0) + now - self._mark
+        self.total[phase] = self.total.get(phase, 0.0) + now - started
+        self._mark = now
+
+    def _timed(self, phase, function):
+
+        def timed(*args, **kwargs):
+            self.start(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.stop()
+
+        return timed
+
+    def _wrap(self, obj, name, timed):
+
+        # Only the attribute of the instance is replaced (and restored by
+        # detach()) - other instances of the class are not timed.
+        self._wrapped.append((obj, name, name in vars(obj),
+                              vars(obj).get(name)))
+        setattr(obj, name, timed)
+
+    def attach(self, agent, env):
+        """
+        Times phases of steps of the agent in the environment until
+        detach() - methods of the agent, of its components and of the
+        environment are replaced by timed ones, so nothing is timed (and
+        nothing slowed) without a timer.
+        """
+        self._wrap(env, "step", self._timed("env_step", env.step))
+        self._wrap(agent, "act", self._timed("act", agent.act))
+        if hasattr(agent, "_plan"):
+            self._wrap(agent, "_plan",
+                       self._timed("planning", agent._plan))
+
+        components = {id(x): x for x in vars(agent).values()
+                      if hasattr(x, "__dict__")}
+        for component in components.values():
+            for name, phase in PHASES.items():
+                if hasattr(component, name):
+                    self._wrap(component, name,
+                               self._timed(phase, getattr(component, name)))
+            if hasattr(component, "discretizer"):
+                self._wrap(component, "discretizer",
+                           _TimedCoder(component.discretizer, self))
+
+    def detach(self):
+
+        while self._wrapped:
+            obj, name, own, original = self._wrapped.pop()
+            if own:
+                setattr(obj, name, original)
+            else:
+                delattr(obj, name)
+
+    def stats(self):
+        """
+        return: calls, total and own times of phases (picklable)
+        """
+        return {"calls": dict(self.calls), "total": dict(self.total),
+                "own": dict(self.own)}
+
+
+def _merge_phases(all_stats):
+
+    merged = {"calls": {}, "total": {}, "own": {}}
+    for stats in all_stats:
+        for key, values in stats.items():
+            for phase, value in values.items():
+                merged[key][phase] = merged[key].get(phase, 0) + value
+
+    return merged
+
+
+class _Profile():
+
+    # pstats reads statistics of profiles from objects with create_stats().
+    def __init__(self, stats):
+
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Instrumentation():
+    """
+    Instrumentation of runs (see run_episodes) by phase timers, cProfile
+    and tracemalloc (each optional). A report of each run is kept in
+    runs - reports of runs of other processes are added by add(), so
+    totals are over runs of all processes.
+    """
+    def __init__(self, phases=True, profile=False, memory=False, top=20):
+        """
+        phases: True for timing phases of steps (see PhaseTimer)
+        profile: True for profiling runs by cProfile
+        memory: True for tracing memory allocations of runs by tracemalloc
+        top: number of functions (lines) listed by profiles (memory
+            reports)
+        """
+        self.phases = phases
+        self.profile = profile
+        self.memory = memory
+        self.top = top
+
+        self.runs = []
+
+        self._timer = None
+        self._profiler = None
+        self._tracing = False
+        self._start_memory = 0
+        self._start_time = None
+
+    def options(self):
+        """
+        return: options of instrumentation (picklable - instrumentation of
+            runs in other processes is made by them)
+        """
+        return {"phases": self.phases, "profile": self.profile,
+                "memory": self.memory, "top": self.top}
+
+    def start(self, agent, env):
+
+        if self.phases:
+            self._timer = PhaseTimer()
+            self._timer.attach(agent, env)
+        if self.memory:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._start_memory = tracemalloc.get_traced_memory()[0]
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+        self._start_time = time.perf_counter()
+
+    def stop(self, tags=None):
+        """
+        tags: fields added to the report
+            example: {"repetition": 2}
+
+        return: report of the run (picklable, also added to runs)
+        """
+        wall_time = time.perf_counter() - self._start_time
+
+        report = dict(tags or {})
+        report["time"] = wall_time
+
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._timer is not None:
+            self._timer.detach()
+            report["phases"] = self._timer.stats()
+            self._timer = None
+        # Memory is reported before statistics of the profile are made
+        # (they are not allocations of the run).
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)])
+            report["memory"] = {
+                "peak": peak - self._start_memory,
+                "retained": current - self._start_memory,
+                "top": [str(stat) for stat
+                        in snapshot.statistics("lineno")[:self.top]]}
+            if self._tracing:
+                tracemalloc.stop()
+        if self._profiler is not None:
+            self._profiler.create_stats()
+            report["profile"] = self._profiler.stats
+            self._profiler = None
+
+        self.add(report)
+
+        return report
+
+    def add(self, report):
+
+        self.runs.append(report)
+
+    def report(self, run=None):
+        """
+        run: report of one run (None - totals over all runs)
+
+        return: text of the report
+        """
+        runs = self.runs if run is None else [run]
+        wall_time = sum(x["time"] for x in runs)
+        lines = ["runs: %d, time: %.3f s" % (len(runs), wall_time)]
+
+        all_phases = [x["phases"] for x in runs if "phases" in x]
+        if all_phases:
+            phases = _merge_phases(all_phases)
+            own = phases["own"]
+            lines.append("%-10s %10s %12s %12s %7s" %
+                         ("phase", "calls", "total [s]", "own [s]", "own %"))
+            for phase in sorted(own, key=own.get, reverse=True):
+                lines.append("%-10s %10d %12.4f %12.4f %7.1f" %
+                             (phase, phases["calls"][phase],
+                              phases["total"][phase], own[phase],
+                              100 * own[phase] / wall_time))
+            other = wall_time - sum(own.values())
+            lines.append("%-10s %10s %12s %12.4f %7.1f" %
+                         ("other", "", "", other, 100 * other / wall_time))
+
+        profiles = [x["profile"] for x in runs if "profile" in x]
+        if profiles:
+            stream = io.StringIO()
+            stats = pstats.Stats(_Profile(profiles[0]), stream=stream)
+            for profile in profiles[1:]:
+                stats.add(_Profile(profile))
+            stats.sort_stats("cumulative").print_stats(self.top)
+            lines.append(stream.getvalue())
+
+        memory = [x["memory"] for x in runs if "memory" in x]
+        if memory:
+            lines.append("memory peak: %.1f KiB" %
+                         (max(x["peak"] for x in memory) / 1024))
+            if len(memory) == 1:
+                lines.append("memory retained: %.1f KiB" %
+                             (memory[0]["retained"] / 1024))
+                lines.extend(memory[0]["top"])
+
+        return "\n".join(lines)
@@ -0,0 +1,223 @@
+import numpy as np
+
+from utils.coding_cache import CodingCache
+from utils.sparse_trace import SparseTrace
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, representation_options
+
+
+
+class QValueFunction():
+    """
+    Tabular Q function allocating cells (bins of tilings) on their first
+    update only. Visited cells are mapped by a dictionary onto rows of a
+    compact array growing on demand, values of the other cells are zeros
+    (the first row is reserved for them) - memory is proportional to the
+    visited part of the state space, not to the product of bins. If
+    max_cells is given then the least recently updated cells are evicted
+    when all cells are used (cells with active traces only if the other
+    cells are not enough - their traces are dropped).
+    """
+    def __init__(self, env, num_actions, granularity, coding_type,
+                 lambda_val=None, et_type=None, cache_size=8, options=None,
+                 initial_cells=1024):
+
+        options = representation_options(options or {})
+        max_cells = options["max_cells"]
+
+        self.et_type = et_type
+
+        self.num_actions = num_actions
+        self.max_cells = max_cells
+        self.initial_cells = initial_cells
+
+        self.num_tilings, _, self.discretizer = \
+            select_coding(env, "tabular", coding_type, granularity,
+                          options)
+
+        # Cells of one state (one per tiling) are updated together.
+        assert max_cells is None or max_cells >= self.num_tilings, \
+            "Less cells than tilings"
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
+        self.tiling_size = np.prod(granularity)
+
+        # Traces are kept for visited (row, action) entries only.
+        if self.et_type is not None:
+            self.lambda_val = lambda_val
+            self.trace_cutoff = options["trace_cutoff"]
+
+        self.dtype = options["dtype"]
+        self.qrows = None
+        self.reset()
+
+    def reset(self):
+        capacity = self.initial_cells + 1
+        if self.max_cells is not None:
+            capacity = min(capacity, self.max_cells + 1)
+
+        self.cells = {}
+        self.free_rows = list(range(capacity - 1, 0, -1))
+        self.qrows = np.zeros((capacity, self.num_actions), dtype=self.dtype)
+
+        # Cell, tiling and time of the last update of each row.
+        self.row_cells = np.full(capacity, -1)
+        self.row_tilings = np.zeros(capacity, dtype=int)
+        self.row_updates = np.zeros(capacity, dtype=int)
+        self.num_updates = 0
+
+        if self.et_type is not None:
+            self.trace = SparseTrace(self.qrows.size, self.trace_cutoff,
+                                     self.dtype)
+
+    def reset_episode(self):
+        if self.et_type is not None:
+            self.trace.reset()
+
+    def get_state(self):
+        state = {"qrows": self.qrows, "row_cells": self.row_cells,
+                 "row_tilings": self.row_tilings,
+                 "row_updates": self.row_updates,
+                 "num_updates": self.num_updates,
+                 "free_rows": np.array(self.free_rows, dtype=int)}
+        if self.et_type is not None:
+            state.update(prefixed("trace", self.trace.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.qrows = np.array(state["qrows"], dtype=self.dtype)
+        self.row_cells = np.array(state["row_cells"])
+        self.row_tilings = np.array(state["row_tilings"])
+        self.row_updates = np.array(state["row_updates"])
+        self.num_updates = int(state["num_updates"])
+
+        # Mapping of cells is given by cells of rows - free rows are
+        # stored in their order (rows are allocated as by the stored Q
+        # function).
+        rows = np.flatnonzero(self.row_cells >= 0)
+        self.cells = dict(zip(self.row_cells[rows].tolist(), rows.tolist()))
+        self.free_rows = np.asarray(state["free_rows"], dtype=int).tolist()
+
+        if self.et_type is not None:
+            self.trace = SparseTrace(self.qrows.size, self.trace_cutoff,
+                                     self.dtype)
+            self.trace.set_state(unprefixed("trace", state))
+
+    def count(self):
+        return len(self.cells)
+
+    def _rows(self, state):
+        cells = self.discretizer(state, sparse_type=True)
+
+        return np.array([self.cells.get(cell, 0) for cell in cells.tolist()])
+
+    def _allocate_rows(self, state):
+        cells = self.discretizer(state, sparse_type=True).tolist()
+
+        self.num_updates += 1
+        rows = np.array([self.cells.get(cell, -1) for cell in cells])
+        self.row_updates[rows[rows > 0]] = self.num_updates
+
+        for i in np.flatnonzero(rows < 0):
+            if not self.free_rows:
+                if (self.max_cells is None
+                        or len(self.qrows) - 1 < self.max_cells):
+                    self._grow()
+                else:
+                    self._evict(rows)
+
+            row = self.free_rows.pop()
+            self.cells[cells[i]] = row
+            self.row_cells[row] = cells[i]
+            self.row_tilings[row] = cells[i] // self.tiling_size
+            self.row_updates[row] = self.num_updates
+            rows[i] = row
+
+        return rows
+
+    def _grow(self):
+        capacity = len(self.qrows) - 1
+        new_capacity = 2 * capacity
+        if self.max_cells is not None:
+            new_capacity = min(new_capacity, self.max_cells)
+        added = new_capacity - capacity
+
+        self.qrows = np.concatenate(
+            (self.qrows, np.zeros((added, self.num_actions), self.dtype)))
+        self.row_cells = np.concatenate((self.row_cells,
+                                         np.full(added, -1)))
+        self.row_tilings = np.concatenate((self.row_tilings,
+                                           np.zeros(added, dtype=int)))
+        self.row_updates = np.concatenate((self.row_updates,
+                                           np.zeros(added, dtype=int)))
+        if self.et_type is not None:
+            self.trace.resize(self.qrows.size)
+
+        self.free_rows = list(range(new_capacity, capacity, -1))
+
+    def _evict(self, protected):
+        # The least recently updated quarter of cells is evicted - rows
+        # being updated are kept, rows with active traces are ranked
+        # after the other rows (by their last updates too).
+        updates = self.row_updates[1:].astype(float)
+        if self.et_type is not None:
+            positions, _ = self.trace.get()
+            updates[positions // self.num_actions - 1] += \
+                self.num_updates + 1
+        updates[protected[protected > 0] - 1] = np.inf
+
+        count = max(1, len(updates) // 4)
+        rows = np.argpartition(updates, count - 1)[:count] + 1
+        rows = rows[np.isfinite(updates[rows - 1])]
+
+        for row in rows:
+            del self.cells[self.row_cells[row]]
+        self.row_cells[rows] = -1
+        self.qrows[rows] = 0
+        if self.et_type is not None:
+            self.trace.remove((rows[:, None] * self.num_actions
+                               + np.arange(self.num_actions)).reshape(-1))
+
+        self.free_rows = list(rows)
+
+    def value(self, state, action):
+        rows = self._rows(state)
+
+        qvalue = self.qrows[rows, action].sum() / self.num_tilings
+
+        return qvalue
+
+    def values(self, state):
+        rows = self._rows(state)
+
+        qvalues = self.qrows[rows].sum(axis=0) / self.num_tilings
+
+        return qvalues
+
+    def update(self, state, action, target, alpha, gamma=None):
+        rows = self._allocate_rows(state)
+
+        # Each tiling is updated by its own error (tables are independent).
+        delta = target - self.qrows[rows, action]
+
+        if self.et_type is None:
+            self.qrows[rows, action] += alpha * delta
+
+        elif self.et_type is not None:
+
+            entries = rows * self.num_actions + action
+
+            if self.et_type == "accumulating":
+                self.trace.add(entries)
+            elif self.et_type == "replacing":
+                self.trace.add(entries, replacing=True)
+            else:
+                unimplemented
+
+            # Each entry is updated by the error of its own tiling.
+            positions, traces = self.trace.get()
+            tilings = self.row_tilings[positions // self.num_actions]
+            self.qrows.reshape(-1)[positions] += \
+                alpha * delta[tilings] * traces
+            self.trace.decay(gamma * self.lambda_val)
@@ -1,24 +1,45 @@
 import numpy as np
 import random
 
-from codings.coding_selector import select_coding
+from utils.coding_cache import CodingCache
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, representation_options
 
 
 
 class PiFunction():
-    def __init__(self, env, actions, granularity, coding_type):
+    def __init__(self, env, actions, granularity, coding_type,
+                 cache_size=8, options=None):
+
+        options = representation_options(options or {})
 
         self.actions = actions
         self.nactions = len(self.actions)
 
         _, self.coding_size, self.discretizer = \
-            select_coding(env, "linapprox", coding_type, granularity)
+            select_coding(env, "linapprox", coding_type, granularity,
+                          options)
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
 
+        self.dtype = options["dtype"]
         self.weigths = None
         self.reset()
 
     def reset(self):
-        self.weigths = np.zeros((self.nactions, self.coding_size))
+        self.weigths = np.zeros((self.nactions, self.coding_size),
+                                dtype=self.dtype)
+        self.discretizer.reset()
+
+    def get_state(self):
+        state = {"weigths": self.weigths}
+        state.update(prefixed("coder", self.discretizer.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.weigths[...] = state["weigths"]
+        self.discretizer.set_state(unprefixed("coder", state))
 
     def _get_action_probs(self, state_coding):
         probs = np.exp(np.matmul(self.weigths, state_coding))
@@ -1,12 +1,19 @@
 import numpy as np
 
-from codings.coding_selector import select_coding
+from utils.coding_cache import CodingCache
+from utils.sparse_trace import SparseTrace
+from utils.storage import allocate, attach, flush
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, BINARY_CODINGS, \
+                                   SPARSE_CODINGS, representation_options
 
 
 
 class QValueFunction():
     def __init__(self, env, num_actions, granularity, coding_type,
-                 lambda_val=None, et_type=None):
+                 lambda_val=None, et_type=None, cache_size=8, options=None):
+
+        options = representation_options(options or {})
 
         self.et_type = et_type
         if self.et_type is not None:
@@ -19,33 +26,120 @@ class QValueFunction():
         self.num_actions = num_actions
 
         _, self.coding_size, self.discretizer = \
-            select_coding(env, "linapprox", coding_type, granularity)
+            select_coding(env, "linapprox", coding_type, granularity,
+                          options)
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
+
+        # Sparse features are represented by positions and values of
+        # non-zero features only (all values of binary features are ones)
+        # - values and updates then gather/scatter weights of these
+        # features instead of processing whole vectors.
+        self.sparse = coding_type in SPARSE_CODINGS
+        self.binary = coding_type in BINARY_CODINGS
 
+        # Weights can be backed by a file (storage_path).
+        self.dtype = options["dtype"]
+        self.storage_path = options["storage_path"]
         self.weigths = None
         self.reset()
 
+        # Traces of sparse features are kept for non-negligible entries
+        # only.
+        if self.et_type is not None and self.sparse:
+            self.trace = SparseTrace(self.coding_size,
+                                     options["trace_cutoff"], self.dtype)
+
     def reset(self):
-        self.weigths = np.zeros((self.num_actions, self.coding_size))
+        if self.weigths is None:
+            self.weigths = allocate((self.num_actions, self.coding_size),
+                                    self.dtype, self.storage_path)
+        else:
+            self.weigths.fill(0)
+        self.discretizer.reset()
+
+    def flush(self):
+        flush(self.weigths)
+
+    def attach(self, storage_path, mode="r"):
+        """
+        storage_path: file with weights stored by another Q function
+            (of the same shape and type)
+        mode: "r" for read only access (evaluation), "r+" for read and
+            write access
+        """
+        self.storage_path = storage_path
+        self.weigths = attach(self.weigths, storage_path, mode)
 
     def reset_episode(self):
-        if self.et_type is not None:
-            self.zweigths = np.zeros(self.weigths[0].shape)
+        if self.et_type is not None and self.sparse:
+            self.trace.reset()
+        elif self.et_type is not None:
+            self.zweigths = np.zeros(self.weigths[0].shape, dtype=self.dtype)
+
+    def get_state(self):
+        state = {"weigths": self.weigths}
+        state.update(prefixed("coder", self.discretizer.get_state()))
+
+        if self.et_type is not None and self.sparse:
+            state.update(prefixed("trace", self.trace.get_state()))
+        elif self.et_type is not None and self.zweigths is not None:
+            state["zweigths"] = self.zweigths
+
+        return state
+
+    def set_state(self, state):
+        self.weigths[...] = state["weigths"]
+        self.discretizer.set_state(unprefixed("coder", state))
+
+        if self.et_type is not None and self.sparse:
+            self.trace.set_state(unprefixed("trace", state))
+        elif "zweigths" in state:
+            self.zweigths = np.array(state["zweigths"], dtype=self.dtype)
+
+    def encode(self, state):
+        if self.binary:
+            return self.discretizer(state, sparse_type=True), 1.0
+        elif self.sparse:
+            return self.discretizer(state, sparse_type=True)
+        else:
+            return self.discretizer(state, vector_type=True)
 
     def value(self, state, action, state_codings=None):
         if state_codings is None:
-            state_codings = self.discretizer(state,vector_type=True)
+            state_codings = self.encode(state)
 
-        qvalue = self.weigths[action].dot(state_codings)
+        if self.sparse:
+            active, values = state_codings
+            qvalue = (self.weigths[action, active] * values).sum()
+        else:
+            qvalue = self.weigths[action].dot(state_codings)
 
         return qvalue
 
+    def values(self, state, state_codings=None):
+        if state_codings is None:
+            state_codings = self.encode(state)
+
+        if self.sparse:
+            active, values = state_codings
+            qvalues = (self.weigths[:, active] * values).sum(axis=1)
+        else:
+            qvalues = self.weigths.dot(state_codings)
+
+        return qvalues
+
     def update(self, state, action, target, alpha, gamma=None, q_old=None):
-        state_codings = self.discretizer(state,vector_type=True)
+        state_codings = self.encode(state)
 
         qvalue = self.value(state, action, state_codings)
         delta = alpha * (target - qvalue)
 
-        if self.et_type is None:
+        if self.sparse:
+            self._sparse_update(*state_codings, action, qvalue, delta,
+                                alpha, gamma, q_old)
+
+        elif self.et_type is None:
             self.weigths[action] += state_codings * delta
 
         elif self.et_type == "accumulating":
@@ -64,4 +158,30 @@ class QValueFunction():
         else:
             unimplemented
 
+    def _sparse_update(self, active, values, action, qvalue, delta,
+                       alpha, gamma, q_old):
+        """
+        The same updates as for vectors of features, but using positions
+        and values of non-zero features (and of active traces) only.
+        """
+        if self.et_type is None:
+            self.weigths[action, active] += values * delta
+
+        elif self.et_type == "accumulating":
+            self.trace.add(active, values)
+            positions, traces = self.trace.get()
+            self.weigths[action, positions] += traces * delta
+            self.trace.decay(gamma * self.lambda_val)
 
+        elif self.et_type == "dutch":
+            self.trace.add(active, values * \
+              (1.0 - alpha * gamma * self.lambda_val * \
+                     (self.trace.get_values(active) * values).sum()))
+            positions, traces = self.trace.get()
+            correction = alpha * (qvalue - q_old)
+            self.weigths[action, positions] += traces * (delta + correction)
+            self.weigths[action, active] -= correction * values
+            self.trace.decay(gamma * self.lambda_val)
+
+        else:
+            unimplemented
@@ -1,20 +1,40 @@
 import numpy as np
 
-from codings.coding_selector import select_coding
+from utils.coding_cache import CodingCache
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, representation_options
 
 
 
 class VValueFunction():
-    def __init__(self, env, granularity, coding_type):
+    def __init__(self, env, granularity, coding_type, cache_size=8,
+                 options=None):
+
+        options = representation_options(options or {})
 
         _, self.coding_size, self.discretizer = \
-            select_coding(env, "linapprox", coding_type, granularity)
+            select_coding(env, "linapprox", coding_type, granularity,
+                          options)
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
 
+        self.dtype = options["dtype"]
         self.weigths = None
         self.reset()
 
     def reset(self):
-        self.weigths = np.zeros((self.coding_size,))
+        self.weigths = np.zeros((self.coding_size,), dtype=self.dtype)
+        self.discretizer.reset()
+
+    def get_state(self):
+        state = {"weigths": self.weigths}
+        state.update(prefixed("coder", self.discretizer.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.weigths[...] = state["weigths"]
+        self.discretizer.set_state(unprefixed("coder", state))
 
     def value(self, state):
         state_codings = self.discretizer(state,vector_type=True)
@@ -0,0 +1,102 @@
+import copy
+import numpy as np
+import gym
+
+from utils.operation_manager import GYM_VER
+from environments.classic_control import VECTOR_ENVS, make_vector_env
+
+
+
+class LockstepEnv():
+    """
+    K copies of an environment stepped together - one step takes an action
+    for each copy and returns states, rewards and ends of episodes of all
+    copies as arrays. Copies whose episodes ended are not stepped (they
+    wait for the other copies), so episodes of all copies start together.
+    """
+    def __init__(self, env, num_envs):
+
+        self.num_envs = num_envs
+
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        self.unwrapped = env.unwrapped
+
+        # Copies are made by the registered id with the time limit of env
+        # (deep copies otherwise).
+        if env.spec is not None:
+            max_episode_steps = getattr(env, "_max_episode_steps", None)
+            self.envs = [gym.make(env.spec.id,
+                                  max_episode_steps=max_episode_steps)
+                         for _ in range(num_envs)]
+        else:
+            self.envs = [copy.deepcopy(env) for _ in range(num_envs)]
+
+        self.states = None
+
+    def reset(self, seed=None):
+        """
+        seed: if given then the i-th copy is seeded by seed + i
+
+        return: initial states, shape (copies, state dimensions)
+        """
+        states = []
+        for i, env in enumerate(self.envs):
+            if seed is None:
+                output = env.reset()
+            elif GYM_VER >= 25:
+                output = env.reset(seed=seed + i)
+            else:
+                env.seed(seed + i)
+                output = env.reset()
+
+            if GYM_VER >= 25:
+                state, _ = output
+            else:
+                state = output
+            states.append(state)
+
+        self.states = np.array(states)
+
+        return self.states.copy()
+
+    def step(self, actions, active):
+        """
+        actions: actions of copies, shape (copies,)
+        active: mask of copies being stepped, shape (copies,)
+
+        return: states, rewards and ends of episodes of copies (states
+            of not stepped copies are unchanged, their rewards are zeros)
+        """
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        for i in np.flatnonzero(active):
+            output = self.envs[i].step(actions[i])
+            if GYM_VER >= 25:
+                state, reward, terminated, truncated, info = output
+                done = terminated or truncated
+            else:
+                state, reward, done, info = output
+
+            self.states[i] = state
+            rewards[i] = reward
+            dones[i] = done
+
+        return self.states.copy(), rewards, dones
+
+
+def make_lockstep_envs(env, num_envs):
+    """
+    env: environment (copies get its time limit)
+    num_envs: number of copies stepped in lockstep
+
+    return: copies simulated by numpy (see make_vector_env) if the
+        environment is simulated, copies of gym's environment otherwise
+    """
+    max_episode_steps = getattr(env, "_max_episode_steps", None)
+    if env.spec is not None and env.spec.id in VECTOR_ENVS:
+        return make_vector_env(env.spec.id, num_envs, autoreset=False,
+                               max_episode_steps=max_episode_steps)
+    else:
+        return LockstepEnv(env, num_envs)
@@ -0,0 +1,126 @@
+import numpy as np
+
+from utils.storage import allocate, flush
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, BINARY_CODINGS, \
+                                   representation_options
+
+
+
+class QValueFunction():
+    """
+    Linear Q functions of K independent agents (repetitions) learned in
+    lockstep. Weights of all agents form one array of shape (K, actions,
+    features) - states of the agents are encoded as one batch and values
+    and updates of all agents are computed by single numpy operations.
+    Binary codings are represented by positions of active features,
+    other codings by vectors of features. Index hash tables of hashed tile
+    coding are learned, so each agent has its own coder then.
+    """
+    def __init__(self, env, num_agents, num_actions, granularity,
+                 coding_type, options=None):
+
+        options = representation_options(options or {})
+
+        self.num_agents = num_agents
+        self.num_actions = num_actions
+
+        _, self.coding_size, self.discretizer = \
+            select_coding(env, "linapprox", coding_type, granularity,
+                          options)
+
+        self.binary = coding_type in BINARY_CODINGS
+
+        self.coders = None
+        if hasattr(self.discretizer, "iht"):
+            self.coders = [self.discretizer] + [
+                select_coding(env, "linapprox", coding_type, granularity,
+                              options)[2]
+                for _ in range(num_agents - 1)]
+
+        # Weights can be backed by a file (storage_path).
+        self.dtype = options["dtype"]
+        self.storage_path = options["storage_path"]
+        self.weigths = None
+        self.reset()
+
+    def reset(self):
+        if self.weigths is None:
+            self.weigths = allocate((self.num_agents, self.num_actions,
+                                     self.coding_size),
+                                    self.dtype, self.storage_path)
+        else:
+            self.weigths.fill(0)
+        for coder in self.coders or []:
+            coder.iht.reset()
+
+    def flush(self):
+        flush(self.weigths)
+
+    def reset_episode(self):
+        pass
+
+    def get_state(self):
+        state = {"weigths": self.weigths}
+        for k, coder in enumerate(self.coders or []):
+            state.update(prefixed("iht%d" % k, coder.iht.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.weigths[...] = state["weigths"]
+        for k, coder in enumerate(self.coders or []):
+            coder.iht.set_state(unprefixed("iht%d" % k, state))
+
+    def encode(self, agents, states):
+        """
+        agents: indices of agents
+        states: states of the agents, shape (agents, state dimensions)
+
+        return: positions of active features, shape (agents, active
+            features), for binary codings, features, shape (agents,
+            features), otherwise
+        """
+        if self.coders is not None:
+            return np.concatenate([self.coders[k](states[i:i + 1],
+                                                  sparse_type=True)
+                                   for i, k in enumerate(agents)])
+        elif self.binary:
+            return self.discretizer(states, sparse_type=True)
+
+        return self.discretizer(states, vector_type=True)
+
+    def values(self, agents, codings):
+        """
+        agents: indices of agents
+        codings: encoded states of the agents (see encode)
+
+        return: q values of all actions, shape (agents, actions)
+        """
+        if self.binary:
+            rows = np.asarray(agents)[:, None]
+            return self.weigths[rows, :, codings].sum(axis=1)
+
+        return np.einsum("kaf,kf->ka", self.weigths[agents], codings)
+
+    def update(self, agents, codings, actions, targets, alpha):
+        """
+        agents: indices of updated agents
+        codings: encoded states of the agents (see encode)
+        actions: actions updated by the agents
+        targets: targets of the updates
+        alpha: learning rate
+        """
+        agents = np.asarray(agents)
+        qvalues = self.values(agents, codings)[np.arange(len(agents)),
+                                               actions]
+        delta = alpha * (targets - qvalues)
+
+        # Repeated positions of a row are all updated (np.add.at).
+        if self.binary:
+            np.add.at(self.weigths,
+                      (agents[:, None], np.asarray(actions)[:, None],
+                       codings),
+                      delta[:, None])
+        else:
+            self.weigths[agents, actions] += codings * delta[:, None]
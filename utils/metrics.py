@@ -0,0 +1,135 @@
+import collections
+import csv
+import json
+
+
+
+# Fields of records of episodes (records of sweeps are tagged by the
+# agent and the repetition too).
+FIELDS = ("agent", "repetition", "episode", "steps", "return", "time",
+          "steps_per_sec", "epsilon")
+
+
+class NullSink():
+    """
+    Sink ignoring all records (no output cost).
+    """
+    def write(self, record):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink():
+    """
+    Sink printing the number of steps of every n-th episode (and the start
+    of each repetition) - the output of the test scripts.
+    """
+    def __init__(self, every=10):
+
+        self.every = every
+
+    def write(self, record):
+
+        if record["episode"] == 1 and "repetition" in record:
+            print("repetition: ", record["repetition"])
+        if record["episode"] % self.every == 0:
+            print(record["steps"])
+
+    def close(self):
+        pass
+
+
+class MemorySink():
+    """
+    Sink keeping records in memory - the last maxlen records only (ring
+    buffer) if maxlen is given.
+    """
+    def __init__(self, maxlen=None):
+
+        self.records = collections.deque(maxlen=maxlen)
+
+    def write(self, record):
+
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class JsonlSink():
+    """
+    Sink writing records into a file as lines of JSON objects (buffered -
+    records reach the file by blocks, all of them on close()).
+    """
+    def __init__(self, path, mode="w", buffer_size=1 << 16):
+        """
+        mode: "w" for a new file, "a" for appending to records of previous
+            runs
+        """
+        self.file = open(path, mode, buffering=buffer_size)
+
+    def write(self, record):
+
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+
+        self.file.close()
+
+
+class CsvSink():
+    """
+    Sink writing records into a CSV file with a column for each field
+    (buffered as JsonlSink) - missing fields are left empty.
+    """
+    def __init__(self, path, mode="w", buffer_size=1 << 16, fields=FIELDS):
+
+        self.file = open(path, mode, newline="", buffering=buffer_size)
+        self.writer = csv.DictWriter(self.file, fields, extrasaction="ignore")
+        if mode == "w":
+            self.writer.writeheader()
+
+    def write(self, record):
+
+        self.writer.writerow(record)
+
+    def close(self):
+
+        self.file.close()
+
+
+class TaggedSink():
+    """
+    Sink adding fields to each record written into another sink.
+    """
+    def __init__(self, sink, **tags):
+        """
+        tags: added fields
+            example: agent="tabular, replacing"
+        """
+        self.sink = sink
+        self.tags = tags
+
+    def write(self, record):
+
+        self.sink.write(dict(record, **self.tags))
+
+    def close(self):
+        pass
+
+
+def open_sink(path):
+    """
+    path: file of records - CSV for ".csv" files, lines of JSON otherwise
+        (None - steps of every 10th episode are printed)
+
+    return: sink of records (to be closed by the caller)
+    """
+    if path is None:
+        return ConsoleSink()
+    elif path.endswith(".csv"):
+        return CsvSink(path)
+    else:
+        return JsonlSink(path)
@@ -1,16 +1,38 @@
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import shutil
+import tempfile
+import time
 import numpy as np
 import gym
 
+from algorithms.algorithm_selector import make_agent
+from utils.metrics import ConsoleSink, MemorySink
+from utils.instrumentation import Instrumentation
 
 
-def run_one_episode(env, agent, training):
+# Parsed once - not on each episode.
+GYM_VER = int(gym.__version__.split('.')[1])
 
-    gym_ver = int(gym.__version__.split('.')[1])
 
+def run_one_episode(env, agent, training, seed=None):
+    """
+    return: number of steps and return (sum of rewards) of the episode
+    """
     agent.reset_episode()
 
-    output  = env.reset()
-    if  gym_ver >= 25:
+    if seed is None:
+        output  = env.reset()
+    elif GYM_VER >= 25:
+        output = env.reset(seed=seed)
+    else:
+        env.seed(seed)
+        output = env.reset()
+
+    if  GYM_VER >= 25:
         state, _ = output
     else:
         state = output
@@ -24,7 +46,7 @@ def run_one_episode(env, agent, training):
         action = agent.act(reward, state, training, done)
 
         output = env.step(action)
-        if  gym_ver >= 25:
+        if  GYM_VER >= 25:
             state, reward, terminated, truncated, info = output
             done = terminated or truncated
         else:
@@ -35,10 +57,32 @@ def run_one_episode(env, agent, training):
 
     num_steps = len(rewards)
 
-    return num_steps
+    return num_steps, sum(rewards)
+
+
+def _epsilon(agent):
+
+    # Agents learning policies directly have no epsilon.
+    epsilon = getattr(getattr(agent, "policy", None), "epsilon", None)
 
+    return None if epsilon is None else float(epsilon)
 
-def run_episodes(env, agent, num_episodes, new_agent, training):
+
+def run_episodes(env, agent, num_episodes, new_agent, training, seed=None,
+                 sink=None, tags=None, instrumentation=None):
+    """
+    seed: if given then the environment is seeded by seed on the first
+        reset (numpy and random are seeded by the caller)
+    sink: sink of records of episodes (see utils/metrics.py) - steps,
+        return, wall time, steps per second and epsilon of each episode
+        (None - steps of every 10th episode are printed)
+    tags: fields added to each record
+        example: {"repetition": 2}
+    instrumentation: if given (Instrumentation) then the run is
+        instrumented and its report (tagged by tags) is kept by it
+    """
+    if sink is None:
+        sink = ConsoleSink()
 
     assert not new_agent or training, "A new agent must be trained"
 
@@ -49,31 +93,604 @@ def run_episodes(env, agent, num_episodes, new_agent, training):
 
     episode = 0
 
+    if instrumentation is not None:
+        instrumentation.start(agent, env)
+
     while num_episodes > episode:
-        num_steps = run_one_episode(env, agent, training)
+        start_time = time.perf_counter()
+        num_steps, episode_return = run_one_episode(
+            env, agent, training, seed if episode == 0 else None)
+        wall_time = time.perf_counter() - start_time
         episode += 1
-        if episode % 10 == 0: 
-            print(num_steps)
+
+        record = dict(tags or {})
+        record.update(episode=episode, steps=num_steps,
+                      time=wall_time, steps_per_sec=num_steps / wall_time,
+                      epsilon=_epsilon(agent))
+        record["return"] = float(episode_return)
+        sink.write(record)
 
         episode_lengths.append(num_steps)
 
+    if instrumentation is not None:
+        instrumentation.stop(tags)
+
     return episode_lengths
 
 
+def _instrumentation(options):
+
+    # Instrumentation of runs in this process (given by options of the
+    # instrumentation of the caller, see Instrumentation.options).
+    return None if options is None else Instrumentation(**options)
+
+
+def _seed_generators(seed):
+
+    # Agents draw from both numpy and random generators.
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+def _env_config(env):
+
+    # Environments are remade by their id (with the time limit of env).
+    return env.spec.id, getattr(env, "_max_episode_steps", None)
+
+
+def _run_params(params, index, repetition):
+
+    # Runs of a sweep share parameters - tables backed by a file get a
+    # file of their own in each run (and process), so runs never write
+    # into the same file.
+    if params.get("storage_path") is None:
+        return params
+
+    storage_path = "%s.%d_%d_%d" % (params["storage_path"], index,
+                                    repetition, os.getpid())
+
+    return dict(params, storage_path=storage_path)
+
+
+def _run_task(task):
+
+    # One repetition of one agent - (index of agent, repetition,
+    # environment config, parameters of agent, number of episodes,
+    # training, seed, options of instrumentation).
+    index, repetition, env_config, params, num_episodes, training, seed, \
+        options = task
+
+    env_id, max_episode_steps = env_config
+    env = gym.make(env_id, max_episode_steps=max_episode_steps)
+
+    if seed is not None:
+        _seed_generators(seed)
+    agent = make_agent(env, _run_params(params, index, repetition))
+
+    # Records are written by the caller (sinks stay in one process).
+    sink = MemorySink()
+    instrumentation = _instrumentation(options)
+    episode_lengths = run_episodes(env, agent, num_episodes,
+                                   True, training, seed, sink,
+                                   instrumentation=instrumentation)
+    env.close()
+
+    reports = [] if instrumentation is None else instrumentation.runs
+
+    return index, repetition, episode_lengths, list(sink.records), reports
+
+
+def _cache_key(cache, task):
+
+    # Runs are keyed by everything they depend on (not by the number of
+    # episodes - shorter runs are prefixes of longer ones).
+    if cache is None:
+        return None
+
+    env_config, params, _, training, seed = task[2:7]
+
+    return cache.key(params, env_config, training, seed)
+
+
+def _average(results):
+
+    # Repetitions are summed in their order (the same for any order of
+    # finishing).
+    avg_episode_lengths = [0] * len(results[0])
+
+    for episode_lengths in results:
+        avg_episode_lengths = [ x+y for x,y in zip(avg_episode_lengths,
+                                                   episode_lengths)]
+
+    avg_episode_lengths = [ x / len(results) for x in avg_episode_lengths]
+
+    return avg_episode_lengths
+
+
+def run_many(env, agents_params, num_episodes, num_repetitions, training,
+             workers=None, seed=None, callback=None, cache=None,
+             sink=None, instrumentation=None):
+    """
+    Repetitions of several agents run as independent (agent, repetition)
+    tasks - with workers, all tasks share one pool of processes.
+
+    env: environment (remade by its id for each task)
+    agents_params: list of parameters of agents (see make_agent)
+    workers: number of processes running tasks in parallel (None for
+        running them in this process)
+    seed: if given then the i-th repetition of each agent seeds numpy,
+        random and the environment by seed + i (as run_repeatedly)
+    callback: if given then called as callback(index, avg_episode_lengths)
+        as soon as all repetitions of the index-th agent finished
+    cache: if given (ResultsCache) then seeded repetitions found in the
+        cache are not run again and finished repetitions are stored
+    sink: sink of records of episodes (see run_episodes) tagged by the
+        agent and the repetition - written as repetitions finish
+    instrumentation: if given (Instrumentation) then repetitions are
+        instrumented and their reports (tagged by the agent and the
+        repetition) are added to it - repetitions found in the cache are
+        not run, so they have no reports
+
+    return: episode lengths averaged over repetitions, for each agent
+    """
+    if sink is None:
+        sink = ConsoleSink()
+
+    env_config = _env_config(env)
+    options = None if instrumentation is None \
+        else instrumentation.options()
+
+    tasks = []
+    cached = []
+    for index, params in enumerate(agents_params):
+        for i in range(num_repetitions):
+            task = (index, i, env_config, params, num_episodes, training,
+                    None if seed is None else seed + i, options)
+            episode_lengths = None
+            if cache is not None:
+                episode_lengths = cache.get(_cache_key(cache, task),
+                                            num_episodes)
+            if episode_lengths is None:
+                tasks.append(task)
+            else:
+                cached.append((index, i, episode_lengths, [], []))
+    keys = {(task[0], task[1]): _cache_key(cache, task) for task in tasks}
+
+    results = [[None] * num_repetitions for _ in agents_params]
+    remaining = [num_repetitions] * len(agents_params)
+    averages = [None] * len(agents_params)
+
+    def collect(finished, store):
+        for index, repetition, episode_lengths, records, reports \
+                in finished:
+            for record in records:
+                sink.write(dict(record, agent=index, repetition=repetition))
+            for report in reports:
+                instrumentation.add(dict(report, agent=index,
+                                         repetition=repetition))
+            if store:
+                cache.put(keys[index, repetition], episode_lengths)
+            results[index][repetition] = episode_lengths
+            remaining[index] -= 1
+            if remaining[index] == 0:
+                averages[index] = _average(results[index])
+                if callback is not None:
+                    callback(index, averages[index])
+
+    collect(cached, False)
+
+    if workers is not None and tasks:
+        with multiprocessing.Pool(workers) as pool:
+            collect(pool.imap_unordered(_run_task, tasks), cache is not None)
+    else:
+        collect(map(_run_task, tasks), cache is not None)
+
+    return averages
+
+
 def run_repeatedly(env, agent, num_episodes, num_repetitions,
-                   new_agent, training):
+                   new_agent, training, workers=None, seed=None,
+                   cache=None, sink=None, instrumentation=None):
+    """
+    agent: the agent learned in all repetitions, or parameters of the
+        agent (a dictionary including "algorithm", see make_agent) - a
+        new agent is then made for each repetition
+    workers: number of processes running repetitions in parallel (None
+        for running them in this process) - requires parameters of the
+        agent
+    seed: if given then the i-th repetition seeds numpy, random and the
+        environment by seed + i - with parameters of the agent, results
+        do not depend on the number of workers
+    cache: results cache of runs (ResultsCache, see run_many) - requires
+        parameters of the agent
+    sink: sink of records of episodes tagged by the repetition (see
+        run_episodes)
+    instrumentation: if given (Instrumentation) then reports of
+        repetitions are added to it (see run_many)
+
+    return: episode lengths averaged over repetitions
+    """
+    if isinstance(agent, dict):
+        assert new_agent, "Agents made by parameters are new agents"
 
-    avg_episode_lengths = [0] * num_episodes
+        [avg_episode_lengths] = run_many(env, [agent], num_episodes,
+                                         num_repetitions, training,
+                                         workers, seed, cache=cache,
+                                         sink=sink,
+                                         instrumentation=instrumentation)
+        return avg_episode_lengths
 
+    assert workers is None and cache is None, \
+        "Workers and cache require parameters of the agent"
+
+    results = []
     for i in range(num_repetitions):
-        print("repetition: ",i)
+        if seed is not None:
+            _seed_generators(seed + i)
         episode_lengths = run_episodes(env, agent, num_episodes,
-                                       new_agent, training)
+                                       new_agent, training,
+                                       None if seed is None else seed + i,
+                                       sink, {"repetition": i},
+                                       instrumentation)
+        results.append(episode_lengths)
 
-        avg_episode_lengths = [ x+y for x,y in zip(avg_episode_lengths,
-                                                   episode_lengths)]
+    return _average(results)
+
+
+def _run_segment(task):
+
+    # Episodes start..stop of one repetition of one agent - episodes after
+    # the first segment continue from the checkpoint of the agent, of
+    # random generators and of the environment generator, so segments
+    # give the same episodes as one run.
+    index, rung, repetition, env_config, params, start, stop, \
+        training, seed, path, final, options = task
+
+    env_id, max_episode_steps = env_config
+    env = gym.make(env_id, max_episode_steps=max_episode_steps)
+
+    sink = MemorySink()
+    instrumentation = _instrumentation(options)
 
-    avg_episode_lengths = [ x / num_repetitions for x in avg_episode_lengths]
+    if start == 0:
+        if seed is not None:
+            _seed_generators(seed)
+        agent = make_agent(env, _run_params(params, index, repetition))
+        episode_lengths = run_episodes(env, agent, stop, True, training,
+                                       seed, sink,
+                                       instrumentation=instrumentation)
+    else:
+        agent = make_agent(env, _run_params(params, index, repetition))
+        agent.load(path + ".npz")
+        with open(path + ".pkl", "rb") as f:
+            np_state, random_state, env.unwrapped.np_random = pickle.load(f)
+        np.random.set_state(np_state)
+        random.setstate(random_state)
+        episode_lengths = run_episodes(env, agent, stop - start, False,
+                                       training, sink=sink,
+                                       instrumentation=instrumentation)
+
+    if not final:
+        agent.save(path + ".npz")
+        with open(path + ".pkl", "wb") as f:
+            pickle.dump((np.random.get_state(), random.getstate(),
+                         env.unwrapped.np_random), f)
+    env.close()
+
+    # Episodes are numbered from the start of the repetition.
+    records = list(sink.records)
+    for record in records:
+        record["episode"] += start
+
+    reports = [] if instrumentation is None else instrumentation.runs
+
+    return index, rung, repetition, episode_lengths, records, reports
+
+
+def run_halving(env, agents_params, num_episodes, num_repetitions,
+                training, skip_episodes, min_episodes, eta=3,
+                maximize=False, workers=None, seed=None, callback=None,
+                cache=None, sink=None, instrumentation=None):
+    """
+    Asynchronous successive halving (ASHA) of several agents - agents
+    start with min_episodes episodes (the first rung) and an agent is
+    promoted to eta times more episodes (the next rung, up to
+    num_episodes) as soon as it is among the best 1/eta of agents which
+    finished its rung. Promoted agents continue their repetitions from
+    checkpoints (no episodes are run again).
+
+    env, agents_params, num_repetitions, training, workers, seed, cache:
+        as for run_many (with workers, promotions depend on the order in
+        which rungs finish) - rungs found in the cache are not run again
+    sink, instrumentation: as for run_many (reports are tagged by the
+        rung too)
+    skip_episodes: episodes skipped by the performance of num_episodes
+        episodes - performances of rungs skip the same fraction of their
+        episodes
+    min_episodes: number of episodes of the first rung
+    eta: 1/eta of agents of a rung is promoted
+    maximize: True if more steps per episode are better (cart pole)
+    callback: if given then called as callback(index, episodes,
+        performance) as soon as all repetitions of the index-th agent
+        finished a rung
+
+    return: number of episodes reached and performance at them for each
+        agent, total number of episodes run (over all repetitions)
+    """
+    budgets = [min(min_episodes, num_episodes)]
+    while budgets[-1] < num_episodes:
+        budgets.append(min(budgets[-1] * eta, num_episodes))
+    num_rungs = len(budgets)
+
+    def performance(avg_episode_lengths, rung):
+        skip = skip_episodes * budgets[rung] // num_episodes
+        x = avg_episode_lengths[skip:]
+        return sum(x)/len(x)
+
+    def ranked(rung):
+        # The best first (ties by the order of agents).
+        sign = -1 if maximize else 1
+        return sorted(finished[rung],
+                      key=lambda i: (sign * finished[rung][i], i))
+
+    episode_lengths = [[[] for _ in range(num_repetitions)]
+                       for _ in agents_params]
+    remaining = {}
+    finished = [{} for _ in budgets]
+    promoted = [set() for _ in budgets]
+    reached = [None] * len(agents_params)
+    started = 0
+    used_episodes = 0
+
+    def promotion(num_promoted):
+        for rung in reversed(range(num_rungs - 1)):
+            best = ranked(rung)[:num_promoted(len(finished[rung]))]
+            for index in best:
+                if index not in promoted[rung]:
+                    promoted[rung].add(index)
+                    return index, rung + 1
+        return None
+
+    def next_job():
+        nonlocal started
+        job = promotion(lambda n: n // eta)
+        if job is None and started < len(agents_params):
+            started += 1
+            job = started - 1, 0
+        return job
+
+    checkpoints = tempfile.mkdtemp()
+    env_config = _env_config(env)
+    options = None if instrumentation is None \
+        else instrumentation.options()
+    tasks = []
+
+    if sink is None:
+        sink = ConsoleSink()
+
+    keys = {}
+    # Number of episodes of the checkpoint of each repetition.
+    checkpointed = {}
+
+    def add_tasks(index, rung):
+        nonlocal outstanding
+        remaining[index, rung] = num_repetitions
+        for repetition in range(num_repetitions):
+            run_seed = None if seed is None else seed + repetition
+            lengths = episode_lengths[index][repetition]
+
+            if cache is not None:
+                keys[index, repetition] = cache.key(
+                    agents_params[index], env_config, training, run_seed)
+                cached = cache.get(keys[index, repetition], budgets[rung])
+                if cached is not None:
+                    done.put((index, rung, repetition,
+                              cached[len(lengths):], None, []))
+                    outstanding += 1
+                    continue
+
+            # Repetitions continue from their checkpoint - episodes after
+            # it (rungs found in the cache) are run again, repetitions
+            # without a checkpoint are run from the first episode.
+            start = checkpointed.get((index, repetition), 0)
+            del lengths[start:]
+
+            path = os.path.join(checkpoints, "%d_%d" % (index, repetition))
+            tasks.append((index, rung, repetition, env_config,
+                          agents_params[index], start, budgets[rung],
+                          training, run_seed, path, rung == num_rungs - 1,
+                          options))
+
+    done = queue.Queue()
+    pool = None if workers is None else multiprocessing.Pool(workers)
+    outstanding = 0
+
+    try:
+        while True:
+            # Free workers take tasks of the next job - a promotion if
+            # possible, a new agent otherwise.
+            while outstanding < (workers or 1):
+                if not tasks:
+                    job = next_job()
+                    if job is None and outstanding == 0:
+                        # Nothing is running - the best agent of a rung is
+                        # promoted even if its rung has less than eta
+                        # agents.
+                        job = promotion(lambda n: max(1, n // eta))
+                    if job is None:
+                        break
+                    add_tasks(*job)
+                    continue
+
+                task = tasks.pop(0)
+                if pool is None:
+                    done.put(_run_segment(task))
+                else:
+                    pool.apply_async(_run_segment, (task,),
+                                     callback=done.put,
+                                     error_callback=done.put)
+                outstanding += 1
+
+            if outstanding == 0:
+                break
+
+            result = done.get()
+            outstanding -= 1
+            if isinstance(result, Exception):
+                raise result
+
+            index, rung, repetition, lengths, records, reports = result
+            episode_lengths[index][repetition] += lengths
+
+            for report in reports:
+                instrumentation.add(dict(report, agent=index, rung=rung,
+                                         repetition=repetition))
+
+            # Records are None for rungs found in the cache (not run).
+            if records is not None:
+                for record in records:
+                    sink.write(dict(record, agent=index,
+                                    repetition=repetition))
+                used_episodes += len(lengths)
+                if rung < num_rungs - 1:
+                    checkpointed[index, repetition] = budgets[rung]
+                if cache is not None:
+                    cache.put(keys[index, repetition],
+                              episode_lengths[index][repetition])
+
+            remaining[index, rung] -= 1
+            if remaining[index, rung] == 0:
+                finished[rung][index] = performance(
+                    _average(episode_lengths[index]), rung)
+                reached[index] = budgets[rung], finished[rung][index]
+                if callback is not None:
+                    callback(index, *reached[index])
+    finally:
+        if pool is not None:
+            pool.terminate()
+        shutil.rmtree(checkpoints)
+
+    return reached, used_episodes
+
+
+def run_lockstep_episode(envs, agent, training, seed=None):
+    """
+    envs: copies of an environment stepped in lockstep (LockstepEnv or
+        a vector environment without autoreset)
+    agent: agent acting in all copies (e.g. LockstepTD)
+    seed: if given then the i-th copy is seeded by seed + i
+
+    return: numbers of steps and returns of episodes of all copies
+    """
+    agent.reset_episode()
+
+    states = envs.reset(seed)
+    rewards = None
+
+    dones = np.zeros(envs.num_envs, dtype=bool)
+    active = np.ones(envs.num_envs, dtype=bool)
+    num_steps = np.zeros(envs.num_envs, dtype=int)
+    returns = np.zeros(envs.num_envs)
+
+    while True:
+        actions = agent.act(rewards, states, training, dones, active)
+
+        # Copies whose episode ended wait for the other copies.
+        active &= ~dones
+        if not active.any():
+            break
+
+        states, rewards, dones = envs.step(actions, active)
+        num_steps += active
+        returns += rewards
+
+    return num_steps, returns
+
+
+def run_lockstep(envs, agent, num_episodes, new_agent, training,
+                 sink=None, seed=None):
+    """
+    The same as run_repeatedly, but repetitions are the copies of the
+    environment learned together by one lockstep agent.
+
+    sink: sink of records of episodes (see run_episodes) - steps and
+        return averaged over copies, steps per second of all copies
+    seed: if given then numpy and random are seeded by seed and the i-th
+        copy by seed + i on the first reset
+
+    return: episode lengths averaged over copies
+    """
+    assert not new_agent or training, "A new agent must be trained"
+
+    if seed is not None:
+        _seed_generators(seed)
+
+    if new_agent:
+        agent.reset()
+
+    if sink is None:
+        sink = ConsoleSink()
+
+    avg_episode_lengths = []
+
+    episode = 0
+
+    while num_episodes > episode:
+        start_time = time.perf_counter()
+        num_steps, returns = run_lockstep_episode(
+            envs, agent, training, seed if episode == 0 else None)
+        wall_time = time.perf_counter() - start_time
+        episode += 1
+
+        record = dict(episode=episode, steps=float(num_steps.mean()),
+                      time=wall_time,
+                      steps_per_sec=int(num_steps.sum()) / wall_time,
+                      epsilon=_epsilon(agent))
+        record["return"] = float(returns.mean())
+        sink.write(record)
+
+        avg_episode_lengths.append(num_steps.mean())
 
     return avg_episode_lengths
 
+
+if __name__ == '__main__':
+    import unittest
+    from copy import deepcopy
+
+    from config import default_params
+    from utils.metrics import NullSink
+    from utils.results_cache import ResultsCache
+
+    class TestRunHalving(unittest.TestCase):
+        def test_cache_filled_during_run(self):
+            env = gym.make("CartPole-v1")
+            params = deepcopy(default_params)
+            params.update(algorithm="sarsa", qfun_type="linear_approx",
+                          coding_type="tile", granularity=[4, 4, 4, 4])
+
+            reference = run_repeatedly(env, params, 27, 1, True, True,
+                                       seed=5, sink=NullSink())
+
+            class FilledCache(ResultsCache):
+                # The second rung is found in the cache - stored by another
+                # run after the first rung was run.
+                def get(self, key, num_episodes):
+                    if num_episodes == 9:
+                        self.put(key, reference[:9])
+                    return super().get(key, num_episodes)
+
+            directory = tempfile.mkdtemp()
+            try:
+                cache = FilledCache(directory)
+                reached, used_episodes = run_halving(
+                    env, [params], 27, 1, True, 0, 3, eta=3, seed=5,
+                    cache=cache, sink=NullSink())
+                key = cache.key(params, _env_config(env), True, 5)
+                self.assertEqual(cache.get(key, 27), reference)
+                self.assertEqual(reached[0][0], 27)
+                self.assertEqual(reached[0][1], sum(reference) / 27)
+            finally:
+                shutil.rmtree(directory)
+
+    unittest.main()
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+
+
+
+class ResultsCache():
+    """
+    Episode lengths of finished runs stored on disk (one file per run),
+    keyed by a hash of everything a run depends on - parameters of the
+    agent, environment, training and seed. Episodes of a run do not
+    depend on the number of episodes run, so the longest run of a key is
+    kept and shorter runs are given by its first episodes. Unseeded runs
+    are not cached (they are not reproducible).
+    """
+    def __init__(self, directory):
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params, env_config, training, seed):
+        """
+        params: parameters of the agent
+        env_config: id and time limit of the environment
+        training: True for training runs
+        seed: seed of the run
+
+        return: key of the run (None for unseeded runs)
+        """
+        if seed is None:
+            return None
+
+        # Parameters are serialized with sorted names, so the key does
+        # not depend on the order of parameters.
+        description = json.dumps([params, list(env_config), training, seed],
+                                 sort_keys=True, default=repr)
+
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key):
+
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key, num_episodes):
+        """
+        return: lengths of the first num_episodes episodes of the run
+            (None if the run is not cached or is shorter)
+        """
+        if key is None:
+            return None
+
+        try:
+            with open(self._path(key)) as f:
+                episode_lengths = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if len(episode_lengths) < num_episodes:
+            return None
+
+        return episode_lengths[:num_episodes]
+
+    def put(self, key, episode_lengths):
+        """
+        Stores episode lengths of the run (unless a longer run of the key
+        is stored already).
+        """
+        if key is None:
+            return
+
+        if self.get(key, len(episode_lengths) + 1) is not None:
+            return
+
+        # Written into a temporary file first - a killed run never leaves
+        # an incomplete file.
+        path = self._path(key)
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump([int(x) for x in episode_lengths], f)
+        os.replace(temp_path, path)
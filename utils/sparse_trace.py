@@ -0,0 +1,143 @@
+import numpy as np
+
+
+
+# Default cutoff of traces (of agents and their representations) - traces
+# decayed below it are dropped. The true online Q function keeps exact
+# traces by default (its results are the same as of the dense dutch
+# trace).
+TRACE_CUTOFF = 1e-4
+
+
+class SparseTrace():
+    """
+    Eligibility trace kept for visited entries only - positions of the
+    entries (in a flattened table of weights) together with their trace
+    values. Decay is applied lazily through a common scale of all values,
+    entries decayed below cutoff are dropped, so the cost of a step is
+    proportional to the number of active entries (not to the table size).
+    """
+    def __init__(self, size, cutoff=None, dtype="float64"):
+
+        self.size = size
+        self.cutoff = TRACE_CUTOFF if cutoff is None else cutoff
+        self.dtype = dtype
+
+        # Slot of each table entry in arrays of active entries (-1 for
+        # entries not being active).
+        self.slots = np.full(size, -1)
+        self.positions = np.zeros(0, dtype=int)
+        self.values = np.zeros(0, dtype=self.dtype)
+        self.scale = 1.0
+
+    def reset(self):
+
+        self.slots[self.positions] = -1
+        self.positions = np.zeros(0, dtype=int)
+        self.values = np.zeros(0, dtype=self.dtype)
+        self.scale = 1.0
+
+    def get_state(self):
+        return {"positions": self.positions, "values": self.values,
+                "scale": self.scale}
+
+    def set_state(self, state):
+        self.reset()
+        self.positions = np.array(state["positions"], dtype=int)
+        self.values = np.array(state["values"], dtype=self.dtype)
+        self.scale = float(state["scale"])
+        self.slots[self.positions] = np.arange(len(self.positions))
+
+    def resize(self, size):
+        """
+        size: new (larger) size of the table
+        """
+        self.slots = np.concatenate((self.slots,
+                                     np.full(size - self.size, -1)))
+        self.size = size
+
+    def add(self, positions, values=1.0, replacing=False):
+        """
+        positions: distinct positions of entries in the table
+            example: entries 3 and 17 -> [3, 17]
+        values: values added to (or replacing) traces of entries
+            example: 1 for both entries -> 1.0
+        replacing: if True then traces are replaced by values, values are
+            accumulated otherwise
+        """
+        positions = np.asarray(positions, dtype=int)
+        values = np.broadcast_to(values, positions.shape)
+
+        slots = self.slots[positions]
+        new = slots < 0
+        if new.any():
+            count = len(self.positions)
+            self.slots[positions[new]] = np.arange(count,
+                                                   count + new.sum())
+            self.positions = np.concatenate((self.positions,
+                                             positions[new]))
+            self.values = np.concatenate((self.values,
+                                          np.zeros(new.sum(), self.dtype)))
+            slots = self.slots[positions]
+
+        # Values are stored unscaled (divided by the common scale).
+        if replacing:
+            self.values[slots] = values / self.scale
+        else:
+            self.values[slots] += values / self.scale
+
+    def remove(self, positions):
+        """
+        positions: positions of entries whose traces are dropped
+            example: entries 3 and 17 -> [3, 17]
+        """
+        self._keep(~np.isin(self.positions, positions))
+
+    def _keep(self, keep):
+
+        # Only active entries selected by keep stay active.
+        if not keep.all():
+            self.slots[self.positions[~keep]] = -1
+            self.positions = self.positions[keep]
+            self.values = self.values[keep]
+            self.slots[self.positions] = np.arange(len(self.positions))
+
+    def get(self):
+        """
+        return: positions of active entries and their trace values
+        """
+        return self.positions, self.values * self.scale
+
+    def get_values(self, positions):
+        """
+        positions: positions of entries in the table
+            example: entries 3 and 17 -> [3, 17]
+
+        return: trace values of the entries (zeros for inactive entries)
+        """
+        slots = self.slots[positions]
+        known = slots >= 0
+
+        values = np.zeros(len(slots), dtype=self.dtype)
+        values[known] = self.values[slots[known]] * self.scale
+
+        return values
+
+    def decay(self, factor):
+        """
+        factor: multiplier of all traces
+            example: gamma 0.99 and lambda 0.8 -> 0.792
+        """
+        self.scale *= factor
+
+        if self.scale == 0:
+            self.reset()
+            return
+
+        if self.cutoff > 0:
+            self._keep(np.abs(self.values) * self.scale >= self.cutoff)
+
+        # Scale is folded into values before it underflows.
+        if self.scale < 1e-100:
+            self.values *= self.scale
+            self.scale = 1.0
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+
+def allocate(shape, dtype, storage_path=None):
+    """
+    shape: shape of the table
+        example: 2 actions and 4096 features -> (2, 4096)
+    dtype: type of table values
+        example: single precision -> "float32"
+    storage_path: if given then the table is backed by this file
+        (memory-mapped), in RAM otherwise
+
+    return: table of zeros
+    """
+    if storage_path is None:
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(storage_path, dtype=dtype, mode="w+", shape=shape)
+
+
+def attach(table, storage_path, mode="r"):
+    """
+    table: table determining shape and type of stored values
+    storage_path: file with stored table (written by another table
+        backed by this file)
+    mode: "r" for read only access, "r+" for read and write access
+
+    return: the table backed by the file (values are not copied)
+    """
+    return np.memmap(storage_path, dtype=table.dtype, mode=mode,
+                     shape=table.shape)
+
+
+def flush(table):
+    """
+    table: table whose values are written into its file (if backed by
+        a file)
+    """
+    if isinstance(table, np.memmap):
+        table.flush()
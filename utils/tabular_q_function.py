@@ -1,67 +1,125 @@
 import numpy as np
 
-from codings.coding_selector import select_coding
+from utils.coding_cache import CodingCache
+from utils.sparse_trace import SparseTrace
+from utils.storage import allocate, attach, flush
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, representation_options
 
 
 
 class QValueFunction():
     def __init__(self, env, num_actions, granularity, coding_type,
-                 lambda_val=None, et_type=None):
+                 lambda_val=None, et_type=None, cache_size=8, options=None):
+
+        options = representation_options(options or {})
 
         self.et_type = et_type
-        if self.et_type is not None:
-            self.lambda_val = lambda_val
-            self.etables = None
 
         self.num_actions = num_actions
         self.bins = granularity
 
         self.num_tilings, _, self.discretizer = \
-            select_coding(env, "tabular", coding_type, granularity)
-
-        self.qtables = None
+            select_coding(env, "tabular", coding_type, granularity,
+                          options)
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
+
+        # Tables of all tilings are stored in one array of shape
+        # (tilings, bins of a tiling, actions), its rows are addressed
+        # directly by positions of active features of the coding. The array
+        # can be backed by a file (storage_path).
+        self.dtype = options["dtype"]
+        self.storage_path = options["storage_path"]
+        self.qtable = None
+        self.qrows = None
         self.reset()
 
+        # Traces are kept for visited (tiling, bin, action) entries only.
+        if self.et_type is not None:
+            self.lambda_val = lambda_val
+            self.trace = SparseTrace(self.qtable.size,
+                                     options["trace_cutoff"], self.dtype)
+            self.tiling_size = self.qtable[0].size
+
     def reset(self):
-        self.qtables = [np.zeros(self.bins + [self.num_actions])
-                         for _ in range(self.num_tilings)]
+        if self.qtable is None:
+            self._set_table(allocate((self.num_tilings, np.prod(self.bins),
+                                      self.num_actions), self.dtype,
+                                     self.storage_path))
+        else:
+            self.qtable.fill(0)
+
+    def _set_table(self, qtable):
+        self.qtable = qtable
+        self.qrows = self.qtable.reshape(-1, self.num_actions)
+        self.qflat = self.qtable.reshape(-1)
+
+    def flush(self):
+        flush(self.qtable)
+
+    def attach(self, storage_path, mode="r"):
+        """
+        storage_path: file with a table stored by another Q function
+            (of the same shape and type)
+        mode: "r" for read only access (evaluation), "r+" for read and
+            write access
+        """
+        self.storage_path = storage_path
+        self._set_table(attach(self.qtable, storage_path, mode))
 
     def reset_episode(self):
         if self.et_type is not None:
-            self.etables = [np.zeros(self.bins + [self.num_actions])
-                            for _ in range(self.num_tilings)]
+            self.trace.reset()
+
+    def get_state(self):
+        state = {"qtable": self.qtable}
+        if self.et_type is not None:
+            state.update(prefixed("trace", self.trace.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.qtable[...] = state["qtable"]
+        if self.et_type is not None:
+            self.trace.set_state(unprefixed("trace", state))
 
     def value(self, state, action):
-        state_codings = self.discretizer(state,vector_type=False)
+        rows = self.discretizer(state, sparse_type=True)
 
-        qvalue = [qtable[coding + (action,)]
-                  for qtable, coding in zip(self.qtables, state_codings)]
-        qvalue = sum(qvalue) / self.num_tilings
+        qvalue = self.qrows[rows, action].sum() / self.num_tilings
 
         return qvalue
 
+    def values(self, state):
+        rows = self.discretizer(state, sparse_type=True)
+
+        qvalues = self.qrows[rows].sum(axis=0) / self.num_tilings
+
+        return qvalues
+
     def update(self, state, action, target, alpha, gamma=None):
-        state_codings = self.discretizer(state, vector_type=False)
+        rows = self.discretizer(state, sparse_type=True)
+
+        # Each tiling is updated by its own error (tables are independent).
+        delta = target - self.qrows[rows, action]
 
         if self.et_type is None:
-            for qtable, coding in zip(self.qtables, state_codings):
-                delta = target - qtable[coding + (action,)]
-                qtable[coding + (action,)] += alpha * delta
+            self.qrows[rows, action] += alpha * delta
 
         elif self.et_type is not None:
-            for qtable, coding, etable in zip(self.qtables,
-                                              state_codings,
-                                              self.etables):
-
-                delta = target - qtable[coding + (action,)]
 
-                if self.et_type == "accumulating":
-                    etable[coding + (action,)] += 1
-                elif self.et_type == "replacing":
-                    etable[coding + (action,)] = 1
-                else:
-                    unimplemented
+            entries = np.asarray(rows) * self.num_actions + action
 
-                qtable += alpha * delta * etable
-                etable *= gamma * self.lambda_val
+            if self.et_type == "accumulating":
+                self.trace.add(entries)
+            elif self.et_type == "replacing":
+                self.trace.add(entries, replacing=True)
+            else:
+                unimplemented
 
+            # Each entry is updated by the error of its own tiling.
+            positions, traces = self.trace.get()
+            tilings = positions // self.tiling_size
+            self.qflat[positions] += alpha * delta[tilings] * traces
+            self.trace.decay(gamma * self.lambda_val)
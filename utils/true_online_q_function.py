@@ -0,0 +1,131 @@
+import numpy as np
+
+from utils.coding_cache import CodingCache
+from utils.sparse_trace import SparseTrace
+from utils.storage import allocate, attach, flush
+from utils.checkpoint import prefixed, unprefixed
+from codings.coding_selector import select_coding, BINARY_CODINGS, \
+                                   representation_options
+
+
+
+class QValueFunction():
+    """
+    Q function learned by true online Sarsa(lambda) for binary codings.
+    States are represented by positions of active features only - values,
+    the dutch trace, the weight update and its correction by the previous
+    value (q_old) are all computed on these positions (and on positions
+    of active traces).
+    """
+    def __init__(self, env, num_actions, granularity, coding_type,
+                 lambda_val, cache_size=8, options=None):
+
+        options = representation_options(options or {})
+
+        assert coding_type in BINARY_CODINGS, \
+            "True online Q function requires binary coding"
+
+        self.lambda_val = lambda_val
+        self.num_actions = num_actions
+
+        _, self.coding_size, self.discretizer = \
+            select_coding(env, "linapprox", coding_type, granularity,
+                          options)
+
+        self.discretizer = CodingCache(self.discretizer, cache_size)
+
+        # Traces are exact unless a cutoff is given, so results are the
+        # same as of the dense dutch trace.
+        trace_cutoff = options["trace_cutoff"]
+        self.trace = SparseTrace(self.coding_size,
+                                 0.0 if trace_cutoff is None else trace_cutoff,
+                                 options["dtype"])
+        self.q_old = 0.0
+
+        # Weights can be backed by a file (storage_path).
+        self.dtype = options["dtype"]
+        self.storage_path = options["storage_path"]
+        self.weigths = None
+        self.reset()
+
+    def reset(self):
+        if self.weigths is None:
+            self.weigths = allocate((self.num_actions, self.coding_size),
+                                    self.dtype, self.storage_path)
+        else:
+            self.weigths.fill(0)
+        self.discretizer.reset()
+
+    def flush(self):
+        flush(self.weigths)
+
+    def attach(self, storage_path, mode="r"):
+        """
+        storage_path: file with weights stored by another Q function
+            (of the same shape and type)
+        mode: "r" for read only access (evaluation), "r+" for read and
+            write access
+        """
+        self.storage_path = storage_path
+        self.weigths = attach(self.weigths, storage_path, mode)
+
+    def reset_episode(self):
+        self.trace.reset()
+        self.q_old = 0.0
+
+    def get_state(self):
+        state = {"weigths": self.weigths, "q_old": self.q_old}
+        state.update(prefixed("coder", self.discretizer.get_state()))
+        state.update(prefixed("trace", self.trace.get_state()))
+
+        return state
+
+    def set_state(self, state):
+        self.weigths[...] = state["weigths"]
+        self.q_old = float(state["q_old"])
+        self.discretizer.set_state(unprefixed("coder", state))
+        self.trace.set_state(unprefixed("trace", state))
+
+    def encode(self, state):
+        return self.discretizer(state, sparse_type=True)
+
+    def value(self, state, action):
+        return self.weigths[action, self.encode(state)].sum()
+
+    def values(self, state):
+        return self.weigths[:, self.encode(state)].sum(axis=1)
+
+    def learn(self, state, action, reward, next_state, next_action,
+              alpha, gamma):
+        """
+        state, action: the state-action pair being updated
+        reward: reward received after taking the action
+        next_state, next_action: the next state-action pair (None for
+            the end of an episode)
+        alpha: learning rate
+        gamma: discount factor
+        """
+        active = self.encode(state)
+        qvalue = self.weigths[action, active].sum()
+
+        if next_state is None:
+            q_next = 0.0
+            target = reward
+        else:
+            q_next = self.value(next_state, next_action)
+            target = reward + gamma * q_next
+
+        delta = alpha * (target - qvalue)
+        decay = gamma * self.lambda_val
+
+        # Dutch trace (all active features have value one).
+        self.trace.add(active, 1.0 - alpha * decay *
+                               self.trace.get_values(active).sum())
+        positions, traces = self.trace.get()
+
+        correction = alpha * (qvalue - self.q_old)
+        self.weigths[action, positions] += traces * (delta + correction)
+        self.weigths[action, active] -= correction
+
+        self.trace.decay(decay)
+        self.q_old = q_next